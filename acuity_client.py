@@ -0,0 +1,122 @@
+# File: acuity_client.py
+# Acuity Scheduling API client: pooled keep-alive session, timeouts, bounded retries, concurrent date fan-out.
+# requests is imported when the first Acuity call is made, so tenants without Acuity never load it.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ACUITY_BASE = "https://acuityscheduling.com/api/v1"
+
+
+class MissingAcuityCredentials(Exception):
+    pass
+
+
+class AcuityError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Acuity error {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class AcuityUnavailable(Exception):
+    # Network-level failure (timeout, refused connection, retries exhausted); the message is the cause's class name
+    pass
+
+
+def env_prefix(client_id: str) -> str:
+    return client_id.upper().replace("-", "_")
+
+
+class AcuityClient:
+    def __init__(self, base_url: str = ACUITY_BASE, connect_timeout: float = 3.05, read_timeout: float = 10,
+                 retries: int = 3, backoff: float = 0.3, pool_size: int = 20, max_workers: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="acuity")
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # Only GETs are retried: re-sending a POST /appointments could double-book
+        retry = Retry(total=self.retries, connect=self.retries, read=self.retries, backoff_factor=self.backoff,
+                      status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset({"GET"}),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def warm(self):
+        # Imports requests and builds the pooled session ahead of the first Acuity call
+        return self.session
+
+    @staticmethod
+    def credentials(client_id: str):
+        prefix = env_prefix(client_id)
+        user = os.getenv(f"ACUITY_USER_ID_{prefix}")
+        key = os.getenv(f"ACUITY_API_KEY_{prefix}")
+        service_id = os.getenv(f"ACUITY_SERVICE_ID_{prefix}")
+        if not all([user, key, service_id]):
+            raise MissingAcuityCredentials(client_id)
+        return user, key, int(service_id)
+
+    def _request(self, method: str, path: str, client_id: str, **kwargs):
+        import requests
+
+        user, key, _ = self.credentials(client_id)
+        try:
+            r = self.session.request(method, f"{self.base_url}{path}", auth=(user, key), timeout=self.timeout,
+                                     **kwargs)
+        except requests.RequestException as e:
+            raise AcuityUnavailable(e.__class__.__name__) from e
+        if r.status_code >= 400:
+            raise AcuityError(r.status_code, r.text)
+        return r.json()
+
+    def availability_times(self, client_id: str, date: str) -> list:
+        # → ISO8601 start times, e.g. ['2025-08-02T15:00:00-04:00', ...]
+        _, _, service_id = self.credentials(client_id)
+        slots = self._request("GET", "/availability/times", client_id,
+                              params={"appointmentTypeID": service_id, "date": date})
+        return [s["time"] for s in slots]
+
+    def availability_times_many(self, client_id: str, dates: list) -> dict:
+        self.credentials(client_id)  # fail fast before fanning out
+        results = self._pool.map(lambda d: self.availability_times(client_id, d), dates)
+        return dict(zip(dates, results))
+
+    def create_appointment(self, client_id: str, first_name: str, last_name: str, email: str,
+                           when: str, notes: str) -> dict:
+        _, _, service_id = self.credentials(client_id)
+        return self._request("POST", "/appointments", client_id, json={
+            "firstName": first_name,
+            "lastName": last_name,
+            "email": email,
+            "datetime": when,
+            "appointmentTypeID": service_id,
+            "notes": notes
+        })
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,139 @@
+# File: answer_cache.py
+# TTL + LRU cache for knowledge-base answers, scoped to (client, KB/config version), with near-duplicate lookup
+
+import collections
+import hashlib
+import json
+import threading
+import time
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+
+def fingerprint(cfg: dict) -> str:
+    # Any config edit (bot name, prompts, ...) moves answers to a fresh bucket
+    blob = json.dumps(cfg or {}, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("answer", "tokens", "emb", "bucket", "stored_at")
+
+    def __init__(self, answer: str, tokens: int, emb, bucket: tuple):
+        self.answer = answer
+        self.tokens = tokens
+        self.emb = emb
+        self.bucket = bucket
+        self.stored_at = time.time()
+
+
+class AnswerCache:
+    def __init__(self, max_items: int = 2000, ttl: float = 3600, near_threshold: float = 0.97):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.near_threshold = near_threshold  # > 1 disables paraphrase matching
+        self._items = collections.OrderedDict()  # (bucket, normalized question) -> _Entry
+        self._buckets = {}   # bucket -> {key: normalized embedding}
+        self._matrix = {}    # bucket -> (keys, stacked embeddings), rebuilt lazily
+        self._current = {}   # client_id -> live bucket
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    @staticmethod
+    def _unit(q_emb):
+        if q_emb is None:
+            return None
+        v = np.asarray(q_emb, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n else None
+
+    def _drop(self, key):
+        e = self._items.pop(key, None)
+        if e is not None:
+            members = self._buckets.get(e.bucket)
+            if members is not None:
+                members.pop(key, None)
+                self._matrix.pop(e.bucket, None)
+                if not members:
+                    del self._buckets[e.bucket]
+
+    def _near(self, bucket: tuple, unit):
+        members = self._buckets.get(bucket)
+        if not members or unit is None or self.near_threshold > 1:
+            return None
+        if bucket not in self._matrix:
+            keys = list(members)
+            self._matrix[bucket] = (keys, np.vstack([members[k] for k in keys]))
+        keys, m = self._matrix[bucket]
+        if m.shape[1] != unit.shape[0]:
+            return None
+        scores = m @ unit
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.near_threshold else None
+
+    def get(self, client_id: str, version, question: str, q_emb=None):
+        bucket = (client_id, version)
+        key = (bucket, normalize_text(question))
+        with self._lock:
+            e = self._items.get(key)
+            hit = "exact"
+            if e is None:
+                near_key = self._near(bucket, self._unit(q_emb))
+                e = self._items.get(near_key) if near_key else None
+                key, hit = near_key, "near"
+            if e is None or time.time() - e.stored_at > self.ttl:
+                if e is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            if hit == "exact":
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self.saved_tokens += e.tokens
+            return e.answer
+
+    def put(self, client_id: str, version, question: str, answer: str, tokens: int = 0, q_emb=None):
+        bucket = (client_id, version)
+        key = (bucket, normalize_text(question))
+        unit = self._unit(q_emb)
+        with self._lock:
+            if self._current.get(client_id) != bucket:
+                # KB or config moved on: answers from the old version are dead weight
+                for old in [k for k, e in self._items.items() if e.bucket[0] == client_id and e.bucket != bucket]:
+                    self._drop(old)
+                self._current[client_id] = bucket
+            self._drop(key)
+            self._items[key] = _Entry(answer, tokens, unit, bucket)
+            if unit is not None:
+                self._buckets.setdefault(bucket, {})[key] = unit
+                self._matrix.pop(bucket, None)
+            while len(self._items) > self.max_items:
+                self._drop(next(iter(self._items)))
+
+    def invalidate(self, client_id: str = None):
+        with self._lock:
+            for key in [k for k, e in self._items.items() if client_id is None or e.bucket[0] == client_id]:
+                self._drop(key)
+            if client_id is None:
+                self._current.clear()
+            else:
+                self._current.pop(client_id, None)
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.near_hits
+        total = hits + self.misses
+        return {
+            "size": len(self._items),
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
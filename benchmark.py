@@ -0,0 +1,325 @@
+# File: benchmark.py
+# Offline benchmarks: KB scoring micro-benchmarks and in-process /chat, /availability and /export load against fakes
+#
+# Usage:
+#   python benchmark.py                                   # defaults below, writes benchmark-results.json
+#   python benchmark.py --sizes 10,1000,100000 --dim 1536 --requests 1000 --concurrency 32 --out before.json
+#   python benchmark.py --no-cache --skip-micro           # upstream-bound e2e numbers only
+# Nothing leaves the machine: OpenAI, Supabase, the config host, Google and Acuity are served by fakes.py.
+
+import argparse
+import asyncio
+import base64
+import datetime
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from fakes import (FakeAcuityServer, FakeConfigServer, FakeGoogleServer, FakeOpenAIServer, FakeSupabaseServer,
+                   fake_embedding)
+from kb_index import KBIndex, normalize_rows
+
+TOKEN = "bench-token"
+EXPORT_TOKEN = "bench-export-token"
+KB_TABLE = "client_knowledge_base"
+LOG_TABLE = "client_conversations"
+GOOGLE_CLIENT = "bench"
+ACUITY_CLIENT = "bench-acuity"
+HOURS = {d: ["09:00", "17:00"] for d in ("monday", "tuesday", "wednesday", "thursday", "friday")}
+
+
+def summarize(samples: list) -> dict:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "min_ms": round(ms[0], 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+def repeat(fn, min_time: float, max_reps: int) -> list:
+    # At least one run; stop after min_time seconds or max_reps runs, whichever comes first
+    samples, spent = [], 0.0
+    while not samples or (spent < min_time and len(samples) < max_reps):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+        spent += samples[-1]
+    return samples
+
+
+async def arepeat(fn, min_time: float, max_reps: int) -> list:
+    samples, spent = [], 0.0
+    while not samples or (spent < min_time and len(samples) < max_reps):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+        spent += samples[-1]
+    return samples
+
+
+def kb_rows(client_id: str, n: int, dim: int, start_id: int, anchors: list = ()) -> list:
+    # Random unit vectors, except the first rows, which embed `anchors` exactly so those questions hit the KB
+    rng = np.random.default_rng(n)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    for i, text in enumerate(anchors[:n]):
+        vecs[i] = fake_embedding(text, dim)
+    return [{"id": start_id + i, "client_id": client_id, "content": f"Knowledge chunk {i} for {client_id}.",
+             "embedding_f32": base64.b64encode(vecs[i].astype("<f4").tobytes()).decode("ascii")}
+            for i in range(n)]
+
+
+def questions(count: int) -> list:
+    return [f"How does feature number {i} work?" for i in range(count)]
+
+
+def conversation_rows(client_id: str, n: int) -> list:
+    start = datetime.datetime(2025, 1, 1)
+    return [{"id": i + 1, "client_id": client_id, "name": f"Visitor {i}", "email": f"v{i}@example.com",
+             "chat_log": f"You: question {i}\nBot: answer {i}\n" * 5, "token": TOKEN,
+             "timestamp": (start + datetime.timedelta(seconds=i // 2)).isoformat()}  # pairs share a timestamp
+            for i in range(n)]
+
+
+def start_fakes(args):
+    today = datetime.date.today()
+    busy = [{"start": f"{today + datetime.timedelta(days=d)}T{h:02d}:00:00Z",
+             "end": f"{today + datetime.timedelta(days=d)}T{h:02d}:45:00Z"}
+            for d in range(args.days) for h in (10, 13, 15)]
+    times = {(today + datetime.timedelta(days=d)).isoformat():
+             [f"{today + datetime.timedelta(days=d)}T{h:02d}:00:00+00:00" for h in range(9, 17)]
+             for d in range(args.days)}
+    fakes = {
+        "openai": FakeOpenAIServer(dim=args.dim, delay=args.upstream_delay),
+        "supabase": FakeSupabaseServer({KB_TABLE: [], LOG_TABLE: conversation_rows(GOOGLE_CLIENT, args.export_rows)}),
+        "config": FakeConfigServer({
+            GOOGLE_CLIENT: {"chatbotName": "BenchBot", "bookingProvider": "google", "timezone": "UTC",
+                            "availableHours": HOURS},
+            ACUITY_CLIENT: {"chatbotName": "BenchBot", "bookingProvider": "acuity", "timezone": "UTC"},
+        }),
+        "google": FakeGoogleServer({"bench@calendar": busy}, delay=args.upstream_delay),
+        "acuity": FakeAcuityServer(times, delay=args.upstream_delay),
+    }
+    for f in fakes.values():
+        f.start()
+    return fakes
+
+
+def configure_env(fakes: dict, args):
+    # Must run before chatbot_api is imported: it reads its settings at import time
+    os.environ.update({
+        "SUPABASE_URL": fakes["supabase"].url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench",
+        "API_TOKEN": TOKEN,
+        "EXPORT_TOKEN": EXPORT_TOKEN,
+        "GOOGLE_CLIENT_ID": "bench",
+        "GOOGLE_CLIENT_SECRET": "bench",
+        "GOOGLE_TOKEN_URI": fakes["google"].url + "/token",
+        "GOOGLE_CALENDAR_URL": fakes["google"].url + "/calendar/v3/",
+        f"GOOGLE_OAUTH_TOKEN_{GOOGLE_CLIENT.upper()}": json.dumps(
+            {"access_token": "a", "refresh_token": "r", "calendar_id": "bench@calendar"}),
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": fakes["openai"].url + "/v1",
+        "CONFIG_URL_BASE": fakes["config"].url + "/configs",
+        "ACUITY_BASE_URL": fakes["acuity"].url,
+        "ACUITY_USER_ID_BENCH_ACUITY": "u",
+        "ACUITY_API_KEY_BENCH_ACUITY": "k",
+        "ACUITY_SERVICE_ID_BENCH_ACUITY": "1",
+        "KB_SEARCH_BACKEND": "local",
+        "EMBED_CACHE_PREWARM": "0",
+        "RATE_LIMIT": "1000000000/1",
+        "RATE_LIMIT_PER_IP": "1000000000/1",
+    })
+    os.environ.pop("EMBED_CACHE_PATH", None)
+    if args.no_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+        os.environ["AVAILABILITY_CACHE_SECONDS"] = "0"
+
+
+def kb_index_for(vecs: np.ndarray) -> KBIndex:
+    idx = KBIndex()
+    idx.ids = list(range(len(vecs)))
+    idx.contents = [""] * len(vecs)
+    idx.matrix = np.ascontiguousarray(normalize_rows(vecs), dtype=np.float32)
+    return idx
+
+
+async def micro(api, fakes: dict, args) -> list:
+    results = []
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        vecs = rng.standard_normal((n, args.dim)).astype(np.float32)
+        rows = [v for v in vecs]
+        q = rng.standard_normal(args.dim).astype(np.float32)
+        samples = repeat(lambda: max(api.cosine(q, r) for r in rows), args.min_time, args.max_reps)
+        results.append({"bench": "cosine_loop", "rows": n, "dim": args.dim, **summarize(samples)})
+
+        idx = kb_index_for(vecs)
+        samples = repeat(lambda: idx.search(q, 1), args.min_time, args.max_reps)
+        results.append({"bench": "kb_index_search", "rows": n, "dim": args.dim, **summarize(samples)})
+        del rows, vecs, idx
+
+        if n > args.kb_max_rows:
+            results.append({"bench": "fetch_best_match", "rows": n, "dim": args.dim,
+                            "skipped": f"more than --kb-max-rows={args.kb_max_rows}"})
+            print(f"  micro rows={n}: done (fetch_best_match skipped)", flush=True)
+            continue
+        client_id = f"micro-{n}"
+        question = "What are your opening hours?"
+        with fakes["supabase"].lock:
+            table = fakes["supabase"].tables[KB_TABLE]
+            table.extend(kb_rows(client_id, n, args.dim, len(table) + 1, [question]))
+        oa = api.get_openai_client(client_id)
+        started = time.perf_counter()
+        ctx, score = await api.fetch_best_match(question, client_id, oa)
+        cold = time.perf_counter() - started
+        samples = await arepeat(lambda: api.fetch_best_match(question, client_id, oa), args.min_time, args.max_reps)
+        results.append({"bench": "fetch_best_match", "rows": n, "dim": args.dim, "cold_ms": round(cold * 1000, 3),
+                        "score": round(score, 4), **summarize(samples)})
+        print(f"  micro rows={n}: done", flush=True)
+    return results
+
+
+async def load(client, make_request, total: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            try:
+                status = (await make_request(i)).status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {"requests": total, "concurrency": concurrency, "seconds": round(wall, 3),
+            "rps": round(total / wall, 2), "statuses": statuses, **summarize(latencies)}
+
+
+async def e2e(api, fakes: dict, args) -> list:
+    qs = questions(args.questions)
+    with fakes["supabase"].lock:
+        table = fakes["supabase"].tables[KB_TABLE]
+        # Half of the questions match a chunk exactly (KB path); the rest fall through to the history prompt
+        table.extend(kb_rows(GOOGLE_CLIENT, args.e2e_rows, args.dim, len(table) + 1, qs[::2]))
+    days = [datetime.date.today() + datetime.timedelta(days=d) for d in range(args.days)]
+
+    scenarios = {
+        "chat": lambda c, i: c.post("/chat", json={"token": TOKEN, "client_id": GOOGLE_CLIENT,
+                                                   "question": qs[i % len(qs)]}),
+        "availability_google": lambda c, i: c.get(f"/availability/{GOOGLE_CLIENT}",
+                                                  params={"date": days[i % len(days)].isoformat(), "token": TOKEN}),
+        "availability_acuity": lambda c, i: c.get(f"/availability/{ACUITY_CLIENT}",
+                                                  params={"date": days[i % len(days)].isoformat(), "token": TOKEN}),
+        "export": lambda c, i: c.get(f"/export/{GOOGLE_CLIENT}/conversations",
+                                     params={"format": "csv" if i % 2 else "ndjson"},
+                                     headers={"Authorization": f"Bearer {EXPORT_TOKEN}"}),
+    }
+    results = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name, request in scenarios.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            # Warm-up pass so one-off costs (discovery build, token refresh, KB load) aren't in the numbers
+            await load(client, lambda i: request(client, i), min(args.concurrency, args.requests), args.concurrency)
+            result = await load(client, lambda i: request(client, i), args.requests, args.concurrency)
+            if set(result["statuses"]) != {"200"}:
+                # Timing error responses would report the speed of the failure path, not of the route
+                raise SystemExit(f"❌ e2e {name}: expected only 200s, got {result['statuses']}")
+            results.append({"bench": name, **result})
+            print(f"  e2e {name}: {result['rps']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms",
+                  flush=True)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> dict:
+    fakes = start_fakes(args)
+    try:
+        configure_env(fakes, args)
+        api = importlib.import_module("chatbot_api")
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {k: v for k, v in vars(args).items() if k != "out"},
+            },
+            "micro": [],
+            "e2e": [],
+        }
+        if not args.skip_micro:
+            report["micro"] = await micro(api, fakes, args)
+        if not args.skip_e2e:
+            report["e2e"] = await e2e(api, fakes, args)
+        report["upstream_requests"] = {name: len(f.requests) for name, f in fakes.items()}
+        await api.close_clients()
+        return report
+    finally:
+        for f in fakes.values():
+            f.stop()
+
+
+def int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run KB micro-benchmarks and in-process load tests against local fakes.")
+    ap.add_argument("--sizes", type=int_list, default=[10, 100, 1000, 10000, 100000], help="KB sizes (rows)")
+    ap.add_argument("--dim", type=int, default=1536, help="embedding dimensions (ada-002 is 1536)")
+    ap.add_argument("--kb-max-rows", type=int, default=20000,
+                    help="largest KB loaded through the fake Supabase for fetch_best_match")
+    ap.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per micro-benchmark")
+    ap.add_argument("--max-reps", type=int, default=200, help="max repetitions per micro-benchmark")
+    ap.add_argument("--requests", type=int, default=500, help="requests per e2e scenario")
+    ap.add_argument("--concurrency", type=int, default=16, help="requests in flight per e2e scenario")
+    ap.add_argument("--questions", type=int, default=20, help="distinct /chat questions cycled through")
+    ap.add_argument("--e2e-rows", type=int, default=1000, help="KB rows for the /chat client")
+    ap.add_argument("--days", type=int, default=14, help="distinct dates cycled through by /availability")
+    ap.add_argument("--scenarios", type=lambda v: v.split(","), default=None,
+                    help="comma-separated subset of: chat, availability_google, availability_acuity, export")
+    ap.add_argument("--export-rows", type=int, default=1000, help="client_conversations rows streamed by /export")
+    ap.add_argument("--upstream-delay", type=float, default=0.0, help="seconds each fake upstream call takes")
+    ap.add_argument("--no-cache", action="store_true", help="disable the answer and availability caches")
+    ap.add_argument("--skip-micro", action="store_true")
+    ap.add_argument("--skip-e2e", action="store_true")
+    ap.add_argument("--out", default="benchmark-results.json", help="JSON results file")
+    args = ap.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -3,48 +3,158 @@
 
 import os
 import time
+import asyncio
 import traceback
 import collections
 import datetime
-import requests
-import ast
-import re
 import json
+import glob
+import hmac
+import importlib
 import pytz
+import tempfile
 
-from typing import List
+from typing import TYPE_CHECKING, List
 from uuid import uuid4
 
+import httpx
 import numpy as np
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from supabase import create_client
-from openai import OpenAI
-
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request as GoogleRequest
-from googleapiclient.discovery import build
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from supabase_rest import AsyncPostgrest, SupabaseError
+from kb_index import make_search_backend
+from config_cache import ConfigCache, ConfigUnavailable
+from embedding_cache import EmbeddingCache
+from openai_pool import OpenAIClientPool
+from answer_cache import AnswerCache, fingerprint
+from intents import IntentRouters
+from rate_limit import Limit, RateLimits, make_rate_limiter, parse_limits
+from write_queue import WriteQueue
+from static_assets import AssetCache, asset_response
+from sessions import Session, make_session_store, summary_prompt
+from prompt_budget import history_prompt, kb_prompt, load_encoding
+from exports import FORMATS, ExportError, ExportSpec, csv_chunk, iter_pages, ndjson_chunk, parse_bound, parse_cursor
+from metrics import MetricsMiddleware, record_usage, registry as metrics_registry, span, timed
+
+# Provider modules are cheap to import; their SDKs (openai, google-api-python-client, requests) load on first use
+from google_calendar import GoogleCalendarRegistry, GoogleNotConfigured, MissingGoogleToken, TOKEN_URI
+from acuity_client import AcuityClient, AcuityError, AcuityUnavailable, MissingAcuityCredentials, ACUITY_BASE
 from dateutil import parser
+from slots import AvailabilityCache, BusyIntervals, generate_slots
 from datetime import timedelta
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 # ─── Load ENV ────────────────────────────────────────────────────────────────
 load_dotenv()
 
 SUPABASE_URL    = os.getenv("SUPABASE_URL")
 SUPABASE_KEY    = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-API_TOKEN       = os.getenv("API_TOKEN")
+API_TOKEN       = os.getenv("API_TOKEN")     # widget token: public (shipped in configs and widget JS)
+ADMIN_TOKEN     = os.getenv("ADMIN_TOKEN")   # server-side only; unset = operator endpoints are off
+EXPORT_TOKEN    = os.getenv("EXPORT_TOKEN") or ADMIN_TOKEN  # plus optional per-client EXPORT_TOKEN_<CLIENT_ID>
 CONFIG_BASE     = os.getenv("CONFIG_URL_BASE") or "https://two47cbackend.onrender.com/configs"
 TABLE_KB        = os.getenv("SUPABASE_TABLE_NAME_KB")  or "client_knowledge_base"
 TABLE_LOG       = os.getenv("SUPABASE_TABLE_NAME_LOG") or "client_conversations"
 GOOGLE_CLIENT_ID     = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
-
-if not all([SUPABASE_URL, SUPABASE_KEY, API_TOKEN, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET]):
+KB_REFRESH_SECONDS   = float(os.getenv("KB_REFRESH_SECONDS") or 60)
+KB_SEARCH_BACKEND    = os.getenv("KB_SEARCH_BACKEND") or "local"   # local | rpc | sqlite
+KB_MATCH_RPC         = os.getenv("KB_MATCH_RPC") or "match_documents"
+KB_SQLITE_PATH       = os.getenv("KB_SQLITE_PATH") or ":memory:"
+CONFIG_TTL           = float(os.getenv("CONFIG_TTL_SECONDS") or 60)
+CONFIG_STALE_TTL     = float(os.getenv("CONFIG_STALE_SECONDS") or 600)
+CONFIG_NEGATIVE_TTL  = float(os.getenv("CONFIG_NEGATIVE_TTL_SECONDS") or 30)
+CONFIG_MAX_ENTRIES   = int(os.getenv("CONFIG_MAX_ENTRIES") or 1000)
+EMBED_MODEL          = "text-embedding-ada-002"
+EMBED_CACHE_SIZE     = int(os.getenv("EMBED_CACHE_SIZE") or 5000)
+EMBED_CACHE_PATH     = os.getenv("EMBED_CACHE_PATH")  # e.g. /var/data/embeddings.sqlite3; unset = memory only
+EMBED_CACHE_PREWARM  = os.getenv("EMBED_CACHE_PREWARM", "1") != "0"
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS") or 50)
+OPENAI_MAX_KEEPALIVE   = int(os.getenv("OPENAI_MAX_KEEPALIVE") or 20)
+OPENAI_MAX_CLIENTS     = int(os.getenv("OPENAI_MAX_CLIENTS") or 1000)
+OPENAI_KEEPALIVE_SECS  = float(os.getenv("OPENAI_KEEPALIVE_SECONDS") or 60)
+OPENAI_TIMEOUT         = float(os.getenv("OPENAI_TIMEOUT_SECONDS") or 30)
+GOOGLE_REFRESH_MARGIN  = float(os.getenv("GOOGLE_REFRESH_MARGIN_SECONDS") or 300)
+GOOGLE_TOKEN_URI       = os.getenv("GOOGLE_TOKEN_URI") or TOKEN_URI
+GOOGLE_CALENDAR_URL    = os.getenv("GOOGLE_CALENDAR_URL")  # override for local fakes; unset = Google
+AVAILABILITY_TTL       = float(os.getenv("AVAILABILITY_CACHE_SECONDS") or 60)
+AVAILABILITY_MAX_DAYS  = int(os.getenv("AVAILABILITY_MAX_DAYS") or 31)
+ACUITY_BASE_URL        = os.getenv("ACUITY_BASE_URL") or ACUITY_BASE
+ACUITY_TIMEOUT         = float(os.getenv("ACUITY_TIMEOUT_SECONDS") or 10)
+ACUITY_RETRIES         = int(os.getenv("ACUITY_RETRIES") or 3)
+ACUITY_POOL_SIZE       = int(os.getenv("ACUITY_POOL_SIZE") or 20)
+ANSWER_CACHE_SIZE      = int(os.getenv("ANSWER_CACHE_SIZE") or 2000)
+ANSWER_CACHE_TTL       = float(os.getenv("ANSWER_CACHE_SECONDS") or 3600)
+ANSWER_CACHE_NEAR      = float(os.getenv("ANSWER_CACHE_SIMILARITY") or 0.97)  # > 1 turns off paraphrase hits
+RATE_LIMIT             = os.getenv("RATE_LIMIT") or "30/60"        # requests/seconds per caller, client and route
+RATE_LIMIT_ROUTES      = os.getenv("RATE_LIMITS") or ""            # e.g. "book=5/60,availability=60/60"
+RATE_LIMIT_PER_IP      = os.getenv("RATE_LIMIT_PER_IP") or "120/60"  # per caller across all routes and client_ids
+RATE_LIMIT_BACKEND     = os.getenv("RATE_LIMIT_BACKEND") or "memory"  # memory | sqlite (shared across workers)
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH")
+RATE_LIMIT_MAX_KEYS    = int(os.getenv("RATE_LIMIT_MAX_KEYS") or 10000)
+WRITE_BATCH_SIZE       = int(os.getenv("WRITE_BATCH_SIZE") or 50)
+WRITE_FLUSH_SECONDS    = float(os.getenv("WRITE_FLUSH_SECONDS") or 2)
+# Rows Supabase can't take right now are journaled here and replayed later; "off" = hold them in memory only
+WRITE_JOURNAL_PATH     = os.getenv("WRITE_JOURNAL_PATH") or os.path.join(tempfile.gettempdir(), "247convo-writes.jsonl")
+if WRITE_JOURNAL_PATH.lower() == "off":
+    WRITE_JOURNAL_PATH = None
+STATIC_MAX_AGE         = int(os.getenv("STATIC_MAX_AGE_SECONDS") or 3600)  # browsers revalidate with ETags after this
+CONFIG_FILE_MAX_AGE    = int(os.getenv("CONFIG_FILE_MAX_AGE_SECONDS") or 60)
+SESSION_BACKEND        = os.getenv("SESSION_BACKEND") or "memory"  # memory | sqlite
+SESSION_SQLITE_PATH    = os.getenv("SESSION_SQLITE_PATH")
+SESSION_TTL            = float(os.getenv("SESSION_TTL_SECONDS") or 86400)
+SESSION_MAX            = int(os.getenv("SESSION_MAX") or 10000)
+SESSION_KEEP_TURNS     = int(os.getenv("SESSION_KEEP_TURNS") or 5)      # recent turns kept verbatim
+SESSION_COMPACT_EVERY  = int(os.getenv("SESSION_COMPACT_EVERY") or 4)   # older turns folded into the summary in batches
+SESSION_MAX_TURNS      = int(os.getenv("SESSION_MAX_TURNS") or 40)      # hard cap if summarizing keeps failing
+PROMPT_TOKEN_BUDGET    = int(os.getenv("PROMPT_TOKEN_BUDGET") or 2000)  # prompt tokens per completion, all context included
+KB_TOP_K               = int(os.getenv("KB_TOP_K") or 4)                # KB chunks considered for the prompt
+HISTORY_MAX_TURNS      = int(os.getenv("HISTORY_MAX_TURNS") or 5)
+WARMUP_CLIENTS         = os.getenv("WARMUP_CLIENTS") or ""  # e.g. "healthyzone,therichjoe"; "*" = every configs/*.json
+WARMUP_TIMEOUT         = float(os.getenv("WARMUP_TIMEOUT_SECONDS") or 60)  # /readyz goes green after this regardless
+WARMUP_CONCURRENCY     = int(os.getenv("WARMUP_CONCURRENCY") or 4)
+EXPORT_PAGE_SIZE       = int(os.getenv("EXPORT_PAGE_SIZE") or 1000)  # rows per keyset page (PostgREST caps at 1000)
+
+# Google credentials are optional: without them only Google-backed booking is unavailable
+if not all([SUPABASE_URL, SUPABASE_KEY, API_TOKEN]):
     raise RuntimeError("❌ Missing one or more required environment variables.")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase_rest = AsyncPostgrest(SUPABASE_URL, SUPABASE_KEY)
+write_queue = WriteQueue(supabase_rest, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_SECONDS,
+                         journal_path=WRITE_JOURNAL_PATH)
+kb_search = make_search_backend(KB_SEARCH_BACKEND, supabase_rest, TABLE_KB, refresh_seconds=KB_REFRESH_SECONDS,
+                                rpc_fn=KB_MATCH_RPC, sqlite_path=KB_SQLITE_PATH)
+config_cache = ConfigCache(CONFIG_BASE, ttl=CONFIG_TTL, stale_ttl=CONFIG_STALE_TTL, negative_ttl=CONFIG_NEGATIVE_TTL,
+                           max_entries=CONFIG_MAX_ENTRIES)
+embedding_cache = EmbeddingCache(max_items=EMBED_CACHE_SIZE, path=EMBED_CACHE_PATH)
+google_calendars = GoogleCalendarRegistry(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, refresh_margin=GOOGLE_REFRESH_MARGIN,
+                                          token_uri=GOOGLE_TOKEN_URI, api_endpoint=GOOGLE_CALENDAR_URL)
+availability_cache = AvailabilityCache(ttl=AVAILABILITY_TTL)
+acuity = AcuityClient(ACUITY_BASE_URL, read_timeout=ACUITY_TIMEOUT, retries=ACUITY_RETRIES, pool_size=ACUITY_POOL_SIZE)
+answer_cache = AnswerCache(max_items=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, near_threshold=ANSWER_CACHE_NEAR)
+metrics_registry.observed("answer_cache_lookups", "Answer cache lookups by result",
+                          lambda: {(r,): answer_cache.stats()[k] for r, k in
+                                   (("exact", "exact_hits"), ("near", "near_hits"), ("miss", "misses"))},
+                          ("result",), kind="counter")
+metrics_registry.observed("answer_cache_hit_ratio", "Share of answer cache lookups served from the cache",
+                          lambda: answer_cache.stats()["hit_ratio"])
+metrics_registry.observed("answer_cache_saved_tokens", "OpenAI tokens not spent because the answer was cached",
+                          lambda: answer_cache.stats()["saved_tokens"], kind="counter")
+intent_routers = IntentRouters()
+static_assets = AssetCache("static")
+config_files = AssetCache("configs")
+session_store = make_session_store(SESSION_BACKEND, SESSION_SQLITE_PATH, max_sessions=SESSION_MAX, ttl=SESSION_TTL)
+rate_limits = RateLimits(make_rate_limiter(RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS),
+                         Limit.parse(RATE_LIMIT), parse_limits(RATE_LIMIT_ROUTES), Limit.parse(RATE_LIMIT_PER_IP))
+openai_pool = OpenAIClientPool(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive=OPENAI_MAX_KEEPALIVE,
+                               keepalive_expiry=OPENAI_KEEPALIVE_SECS, timeout=OPENAI_TIMEOUT,
+                               max_clients=OPENAI_MAX_CLIENTS)
 
 # ─── App Init ────────────────────────────────────────────────────────────────
 app = FastAPI()
@@ -55,15 +165,33 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # ─── Core Helpers ─────────────────────────────────────────────────────────────
-def fetch_config(client_id: str) -> dict:
+def fetch_config(client_id: str, required: bool = False) -> dict:
+    # Unknown clients are cached as {}; only an unreachable host with no cached copy is an error
     try:
-        r = requests.get(f"{CONFIG_BASE}/{client_id}.json", timeout=2)
-        return r.json() if r.ok else {}
-    except:
+        with span("config", client_id):
+            return config_cache.get(client_id)
+    except ConfigUnavailable:
+        if required:
+            raise HTTPException(503, {"error": "Client configuration is temporarily unavailable"})
+        return {}
+
+async def afetch_config(client_id: str, required: bool = False) -> dict:
+    try:
+        return await timed("config", client_id, config_cache.aget(client_id))
+    except ConfigUnavailable:
+        if required:
+            raise HTTPException(503, {"error": "Client configuration is temporarily unavailable"})
         return {}
 
+def reject_unknown_client(client_id: str):
+    # The config host 404'd this client_id: refuse it before rate-limit buckets, OpenAI clients,
+    # KB indexes or calendar services get built for it
+    if config_cache.known_missing(client_id):
+        raise HTTPException(404, {"error": "Unknown client_id"})
+
 def is_within_available_hours(dt: datetime.datetime, config: dict) -> bool:
     day_name = dt.strftime("%A").lower()  # e.g., 'monday'
     available = config.get("availableHours", {}).get(day_name)
@@ -77,15 +205,42 @@ def is_within_available_hours(dt: datetime.datetime, config: dict) -> bool:
     end_time = datetime.time(end_parts[0], end_parts[1])
     return start_time <= dt_local <= end_time
 
-def get_openai_client(client_id: str) -> OpenAI:
-    key_env = f"OPENAI_API_KEY_{client_id.replace('-', '_').upper()}"
-    key = os.getenv(key_env, os.getenv("OPENAI_API_KEY"))
-    if not key:
-        raise RuntimeError(f"No OpenAI key for client '{client_id}'")
-    return OpenAI(api_key=key)
-
-def get_embedding(text: str, client: OpenAI) -> List[float]:
-    return client.embeddings.create(model="text-embedding-ada-002", input=[text]).data[0].embedding
+def business_tz(cfg: dict, fallback: str = "UTC"):
+    try:
+        return pytz.timezone(cfg.get("timezone") or fallback)
+    except pytz.UnknownTimeZoneError:
+        return pytz.utc
+
+def get_openai_client(client_id: str) -> "AsyncOpenAI":
+    # Reused per tenant; rebuilt only if its OPENAI_API_KEY_* value changes
+    return openai_pool.get(client_id)
+
+async def get_embedding(text: str, client: "AsyncOpenAI", client_id: str = "") -> np.ndarray:
+    cached = embedding_cache.get(EMBED_MODEL, text)
+    if cached is not None:
+        return cached
+    res = await client.embeddings.create(model=EMBED_MODEL, input=[text])
+    record_usage(client_id, EMBED_MODEL, res.usage)
+    return embedding_cache.put(EMBED_MODEL, text, res.data[0].embedding)
+
+async def prewarm_embeddings(config_dir: str = "configs"):
+    # Quick-option buttons are the most repeated questions; embed them once per process (or once ever with a disk cache)
+    for fp in sorted(glob.glob(os.path.join(config_dir, "*.json"))):
+        client_id = os.path.splitext(os.path.basename(fp))[0]
+        try:
+            with open(fp, encoding="utf-8") as f:
+                cfg = json.load(f)
+            texts = sorted({v.strip() for k, v in cfg.items()
+                            if k.startswith("quickOption") and isinstance(v, str) and v.strip()})
+            texts = [t for t in texts if not embedding_cache.contains(EMBED_MODEL, t)]
+            if not texts:
+                continue
+            res = await get_openai_client(client_id).embeddings.create(model=EMBED_MODEL, input=texts)
+            record_usage(client_id, EMBED_MODEL, res.usage)
+            for t, d in zip(texts, res.data):
+                embedding_cache.put(EMBED_MODEL, t, d.embedding)
+        except Exception:
+            traceback.print_exc()
 
 def cosine(a: List[float], b: List[float]) -> float:
     a_arr, b_arr = np.array(a), np.array(b)
@@ -93,81 +248,77 @@ def cosine(a: List[float], b: List[float]) -> float:
 
 SIM_THRESHOLD = 0.60
 
-def fetch_best_match(q, client_id, openai_client):
-    q_emb = get_embedding(q, openai_client)
-    rows = supabase.table(TABLE_KB).select("*").eq("client_id", client_id).execute().data or []
-    best, best_score = "", -1.0
-    for r in rows:
-        try:
-            emb = ast.literal_eval(r["embedding"]) if isinstance(r["embedding"], str) else r["embedding"]
-            sc = cosine(q_emb, emb)
-            if sc > best_score:
-                best, best_score = r["content"], sc
-        except:
-            pass
-    return best, best_score
-
-def is_greeting(t: str) -> bool:
-    return bool(re.search(r"\b(hi|hello|hey|howdy|good\s?(morning|afternoon|evening))\b", t.strip(), re.I))
-
-RATE_LIMIT, RATE_PERIOD = 30, 60
-_hits = {}
-
-def rate_limited(ip: str) -> bool:
-    now_ts = time.time()
-    bucket = _hits.setdefault(ip, collections.deque())
-    while bucket and now_ts - bucket[0] > RATE_PERIOD:
-        bucket.popleft()
-    if len(bucket) >= RATE_LIMIT:
-        return True
-    bucket.append(now_ts)
-    return False
-
-def answer(user_q: str, client_id: str, cfg: dict, oa: OpenAI, history: list = None, booking: dict = None) -> str:
+async def fetch_top_matches(q, client_id, openai_client, k: int = 1) -> tuple:
+    # → (hits, query embedding); the embedding call and backend warm-up (e.g. local index refresh) are
+    # independent round-trips
+    q_emb, _ = await asyncio.gather(timed("embed", client_id, get_embedding(q, openai_client, client_id)),
+                                    timed("kb_prepare", client_id, kb_search.prepare(client_id)))
+    return await timed("kb_search", client_id, kb_search.search(client_id, q_emb, k)), q_emb
+
+async def fetch_best_match(q, client_id, openai_client):
+    hits, _ = await fetch_top_matches(q, client_id, openai_client, k=1)
+    return hits[0] if hits else ("", -1.0)
+
+def require_bearer(req: Request, *secrets: str):
+    # Operator/reporting endpoints: a server-side secret in "Authorization: Bearer", never the public widget
+    # token and never a query parameter (those end up in access logs)
+    secrets = [s for s in secrets if s]
+    if not secrets:
+        raise HTTPException(404, "Not Found")  # disabled until a secret is configured
+    scheme, _, value = req.headers.get("authorization", "").partition(" ")
+    presented = value.strip().encode()
+    # Compare against every candidate so timing doesn't reveal which one (if any) was close
+    ok = [hmac.compare_digest(presented, s.encode()) for s in secrets]
+    if scheme.lower() != "bearer" or not any(ok):
+        raise HTTPException(401, "Bad token", headers={"WWW-Authenticate": "Bearer"})
+
+def export_token_env_name(client_id: str) -> str:
+    return f"EXPORT_TOKEN_{client_id.upper().replace('-', '_')}"
+
+def enforce_rate_limit(req: Request, route: str, client_id: str):
+    # Threadpool routes; async routes use aenforce_rate_limit so a shared SQLite limiter can't stall the loop
+    retry_after = rate_limits.check(route, client_id, req.client.host if req.client else "")
+    if retry_after is not None:
+        raise HTTPException(429, "Rate limit", headers={"Retry-After": str(retry_after)})
+
+async def aenforce_rate_limit(req: Request, route: str, client_id: str):
+    retry_after = await rate_limits.acheck(route, client_id, req.client.host if req.client else "")
+    if retry_after is not None:
+        raise HTTPException(429, "Rate limit", headers={"Retry-After": str(retry_after)})
+
+CHAT_MODEL = "gpt-3.5-turbo"
+ChatPlan = collections.namedtuple("ChatPlan", "messages fallback cache", defaults=(None,))  # fallback=None lets errors propagate
+AnswerKey = collections.namedtuple("AnswerKey", "client_id version question q_emb")
+CANCEL_REPLY = "No problem, I've cancelled that booking. Is there anything else I can help you with?"
+
+def greeting_plan(user_q: str, cfg: dict) -> ChatPlan:
+    return ChatPlan([
+        {"role": "system", "content": f"You are {cfg.get('chatbotName','Chatbot')}."},
+        {"role": "user",   "content": user_q}
+    ], None)
+
+async def plan_answer(user_q: str, client_id: str, cfg: dict, oa: "AsyncOpenAI", history: list = None,
+                      booking: dict = None, summary: str = ""):
+    # Returns either a ready reply (str) or the ChatPlan for the completion that should produce it
+    if cfg is None:
+        # Served from the config cache on the hot path; routing needs the client's intent overrides
+        cfg = await afetch_config(client_id)
+    intent = intent_routers.for_config(cfg).route(user_q)
     # Cancellation handling block - always keep this as the FIRST thing!
-    if booking and isinstance(booking, dict):
-        user_cancel_phrases = [
-            "start over",
-            "booking cancelled",
-            "cancel",
-            "i am not booking now",
-            "no",
-            "never mind",
-            "forget it",
-            "stop",
-            "don't want",
-            "not now",
-            "exit",
-            "nope",
-            "quit",
-            "back",
-            "don’t want",
-            "book later",
-            "maybe another time",
-            "some other time",
-            "not booking",
-            "not booking now",
-            "not booking anymore",
-            "don’t want to book",
-            "i don't want to book anymore",
-            "i’m not booking",
-            "will book later"
-        ]
-        user_q_norm = user_q.strip().lower()
-        if any(phrase in user_q_norm for phrase in user_cancel_phrases):
-            booking["inProgress"] = False
-            booking["date"] = None
-            booking["time"] = None
+    if booking and isinstance(booking, dict) and intent.cancel:
+        was_booking = booking.get("inProgress")
+        booking["inProgress"] = False
+        booking["date"] = None
+        booking["time"] = None
+        if was_booking and intent.cancel_only:
+            # Nothing but a cancel phrase: no retrieval or completion needed
+            return cfg.get("cancelReply") or CANCEL_REPLY
     # ⬆️ END CANCELLATION BLOCK
-    ctx, score = fetch_best_match(user_q, client_id, oa)
     history = history or []
     booking = booking or {}
 
     # Proactive booking interruption
-    if booking.get("inProgress") and not any(
-        kw in user_q.lower()
-        for kw in ["book", "booking", "appointment", "meeting", "schedule", "continue", "confirm", "cancel"]
-    ):
+    if booking.get("inProgress") and not intent.booking:
         # User has a booking in progress but is asking about something else
         return (
             "🕒 You have a booking in progress"
@@ -176,25 +327,23 @@ def answer(user_q: str, client_id: str, cfg: dict, oa: OpenAI, history: list = N
             "Would you like to continue your booking or start over? (Type 'continue' or 'start over')"
         )
 
-    if score >= SIM_THRESHOLD:
-        # If knowledge base match, just answer with KB context
-        prompt = f"You are {cfg.get('chatbotName','Chatbot')}. Answer using ONLY this knowledge:\n\n{ctx}\n\nQ: {user_q}\nA:"
-        res = oa.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return res.choices[0].message.content.strip()
-    if is_greeting(user_q):
-        res = oa.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": f"You are {cfg.get('chatbotName','Chatbot')}."},
-                {"role": "user",   "content": user_q}
-            ]
-        )
-        return res.choices[0].message.content.strip()
+    if intent.greeting_only:
+        # A bare "hi there!" can't match the KB usefully; skip the embedding and the search
+        return greeting_plan(user_q, cfg)
+    hits, q_emb = await fetch_top_matches(user_q, client_id, oa, k=KB_TOP_K)
+
+    if hits and hits[0][1] >= SIM_THRESHOLD:
+        # If knowledge base match, just answer with KB context: every chunk above the threshold, best first, within budget
+        with span("prompt_build", client_id):
+            prompt = kb_prompt(cfg.get('chatbotName', 'Chatbot'), [c for c, s in hits if s >= SIM_THRESHOLD], user_q,
+                               PROMPT_TOKEN_BUDGET, CHAT_MODEL)
+        # The reply depends only on KB, config and question, so it is cacheable
+        key = AnswerKey(client_id, (kb_search.kb_version(client_id), fingerprint(cfg)), user_q, q_emb)
+        return ChatPlan([{"role": "user", "content": prompt}], None, key)
+    if intent.greeting:
+        return greeting_plan(user_q, cfg)
     # --- NEW: Use conversation history for context-aware prompt ---
-    # Build prompt from history (max 5 most recent)
+    # Build prompt from history (newest turns first, up to HISTORY_MAX_TURNS, within PROMPT_TOKEN_BUDGET)
     # --- Use booking context + conversation history ---
     booking_context = ""
     if booking.get("inProgress"):
@@ -203,39 +352,236 @@ def answer(user_q: str, client_id: str, cfg: dict, oa: OpenAI, history: list = N
             f"{booking.get('time', 'unknown time')}. Respond accordingly.\n"
         )
 
-    prompt = booking_context  # <<-- Always at the top of the prompt!
-    for turn in (history[-5:] if len(history) > 5 else history):
-        user = turn.get("user", "")
-        bot  = turn.get("bot", "")
-        prompt += f"User: {user}\nBot: {bot}\n"
-    prompt += f"User: {user_q}\nBot:"
+    with span("prompt_build", client_id):
+        prompt = history_prompt(booking_context, summary, history, user_q, PROMPT_TOKEN_BUDGET,
+                                HISTORY_MAX_TURNS, CHAT_MODEL)
+    return ChatPlan([{"role": "user", "content": prompt}],
+                    "Sorry, there was a problem understanding your last message.")
+
+def cached_answer(plan: ChatPlan):
+    if plan.cache is None:
+        return None
+    k = plan.cache
+    return answer_cache.get(k.client_id, k.version, k.question, k.q_emb)
+
+def store_answer(plan: ChatPlan, text: str, usage=None):
+    if plan.cache is None or not text:
+        return
+    k = plan.cache
+    answer_cache.put(k.client_id, k.version, k.question, text,
+                     tokens=getattr(usage, "total_tokens", 0) or 0, q_emb=k.q_emb)
+
+async def answer(user_q: str, client_id: str, cfg: dict, oa: "AsyncOpenAI", history: list = None, booking: dict = None,
+                 summary: str = "") -> str:
+    plan = await plan_answer(user_q, client_id, cfg, oa, history, booking, summary)
+    if isinstance(plan, str):
+        return plan
+    hit = cached_answer(plan)
+    if hit is not None:
+        return hit
     try:
-        res = oa.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return res.choices[0].message.content.strip()
+        with span("completion", client_id):
+            res = await oa.chat.completions.create(model=CHAT_MODEL, messages=plan.messages)
+        record_usage(client_id, CHAT_MODEL, res.usage)
+        text = res.choices[0].message.content.strip()
+        store_answer(plan, text, res.usage)
+        return text
+    except Exception:
+        if plan.fallback is None:
+            raise
+        return plan.fallback
+
+async def answer_stream(user_q: str, client_id: str, cfg: dict, oa: "AsyncOpenAI", history: list = None,
+                        booking: dict = None, summary: str = ""):
+    # Same routing as answer(), but yields completion deltas as they arrive
+    plan = await plan_answer(user_q, client_id, cfg, oa, history, booking, summary)
+    if isinstance(plan, str):
+        yield plan
+        return
+    hit = cached_answer(plan)
+    if hit is not None:
+        yield hit
+        return
+    started, parts, usage = False, [], None
+    try:
+        with span("completion", client_id):
+            stream = await oa.chat.completions.create(model=CHAT_MODEL, messages=plan.messages, stream=True,
+                                                      stream_options={"include_usage": True})
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not started and delta:
+                    delta = delta.lstrip()
+                if delta:
+                    started = True
+                    parts.append(delta)
+                    yield delta
+        record_usage(client_id, CHAT_MODEL, usage)
+        store_answer(plan, "".join(parts).strip(), usage)
     except Exception:
-        return "Sorry, there was a problem understanding your last message."
+        if plan.fallback is None or started:
+            raise
+        yield plan.fallback
 
-def get_google_credentials_from_env(client_id):
-    key = f"GOOGLE_OAUTH_TOKEN_{client_id.upper().replace('-', '_')}"
-    token_json = os.getenv(key)
-    if not token_json:
+def get_calendar_service(client_id):
+    # Cached per tenant: discovery is parsed once and tokens refresh before they expire
+    try:
+        with span("google_auth", client_id):
+            return google_calendars.get(client_id)
+    except GoogleNotConfigured:
+        raise HTTPException(503, "Google Calendar is not configured on this server")
+    except MissingGoogleToken:
         raise HTTPException(400, "Missing Google OAuth token for client")
-    info = json.loads(token_json)
-    creds = Credentials(
-        token=info["access_token"],
-        refresh_token=info["refresh_token"],
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET
-    )
-    if creds.expired and creds.refresh_token:
-        creds.refresh(GoogleRequest())
-    return creds, info["calendar_id"]
+
+def google_busy(client_id: str, first_day: datetime.date, last_day: datetime.date, tz) -> BusyIntervals:
+    # One free/busy query per day range, reused by every /availability call it covers until the TTL lapses
+    cached = availability_cache.get(client_id, first_day, last_day)
+    if cached is not None:
+        return cached
+    service, calendar_id = get_calendar_service(client_id)
+    start_dt = tz.localize(datetime.datetime.combine(first_day, datetime.time.min))
+    end_dt = tz.localize(datetime.datetime.combine(last_day + timedelta(days=1), datetime.time.min))
+    with span("google_freebusy", client_id):
+        fb_result = service.freebusy().query(body={
+            "timeMin": start_dt.isoformat(),
+            "timeMax": end_dt.isoformat(),
+            "timeZone": tz.zone,
+            "items": [{"id": calendar_id}]
+        }).execute()
+    busy = BusyIntervals.from_google(fb_result["calendars"][calendar_id].get("busy", []))
+    availability_cache.put(client_id, first_day, last_day, busy)
+    return busy
+
+def acuity_call(fn, *args, **kwargs):
+    # Maps Acuity client failures onto the API's existing error shapes; timed per client method
+    try:
+        with span(f"acuity_{fn.__name__}", args[0] if args else ""):
+            return fn(*args, **kwargs)
+    except MissingAcuityCredentials:
+        raise HTTPException(400, {"error": "Missing Acuity credentials"})
+    except AcuityError as e:
+        raise HTTPException(e.status_code, {"error": f"Acuity error: {e.text}"})
+    except AcuityUnavailable as e:
+        raise HTTPException(502, {"error": f"Acuity unavailable: {e}"})
+
+def acuity_times(client_id: str, days: list) -> dict:
+    # {YYYY-MM-DD: [ISO8601, ...]} for each requested day, fetched concurrently and cached like Google free/busy
+    cached = availability_cache.get(client_id, days[0], days[-1])
+    if cached is not None:
+        return {d.isoformat(): cached.get(d.isoformat(), []) for d in days}
+    times = acuity_call(acuity.availability_times_many, client_id, [d.isoformat() for d in days])
+    availability_cache.put(client_id, days[0], days[-1], times)
+    return times
+
+def parse_day(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise HTTPException(400, {"error": "Invalid date"})
 
 # ─── Debug & Status ───────────────────────────────────────────────────────────
+_background_tasks = set()
+
+warmup = {"ready": False, "clients": [], "failed": [], "seconds": None}
+
+def warmup_client_ids() -> list:
+    if WARMUP_CLIENTS.strip() == "*":
+        return sorted(os.path.splitext(os.path.basename(fp))[0] for fp in glob.glob(os.path.join("configs", "*.json")))
+    return [c.strip() for c in WARMUP_CLIENTS.split(",") if c.strip()]
+
+async def warm_client(client_id: str):
+    # Everything a first chat or booking request for this client would otherwise pay for
+    get_openai_client(client_id)
+    cfg = await afetch_config(client_id)
+    await kb_search.prepare(client_id)
+    provider = (cfg.get("bookingProvider") or "google").lower()
+    if provider == "google" and google_calendars.configured and google_calendars.has_token(client_id):
+        await run_in_threadpool(google_calendars.get, client_id)  # discovery build + token refresh
+    elif provider == "acuity":
+        await run_in_threadpool(acuity.warm)
+
+async def warm_up():
+    started = time.time()
+    clients = warmup_client_ids()
+    sem = asyncio.Semaphore(WARMUP_CONCURRENCY)
+
+    async def one(client_id: str):
+        async with sem:
+            try:
+                with span("warmup", client_id):
+                    await warm_client(client_id)
+                warmup["clients"].append(client_id)
+            except Exception:
+                traceback.print_exc()
+                warmup["failed"].append(client_id)
+
+    try:
+        if clients or EMBED_CACHE_PREWARM:
+            # The OpenAI SDK takes ~0.5 s to import; do it off the event loop so /healthz keeps answering
+            await asyncio.to_thread(importlib.import_module, "openai")
+        jobs = [one(c) for c in clients]
+        jobs.append(asyncio.to_thread(load_encoding, CHAT_MODEL))  # tiktoken fetches its BPE file on first use
+        if EMBED_CACHE_PREWARM:
+            jobs.append(prewarm_embeddings())
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        # asyncio.wait doesn't cancel on timeout: slow clients keep warming while /readyz already says ready
+        _, pending = await asyncio.wait(tasks, timeout=WARMUP_TIMEOUT) if tasks else (set(), set())
+        if pending:
+            print(f"⚠️ Warm-up still running after {WARMUP_TIMEOUT:.0f}s ({len(pending)} jobs left); "
+                  "taking traffic anyway")
+            for task in pending:
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        warmup["seconds"] = round(time.time() - started, 3)
+        warmup["ready"] = True
+
+@app.on_event("startup")
+async def warm_caches():
+    # Runs after startup so the process is live at once; /readyz reports when it's done
+    task = asyncio.create_task(warm_up())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+@app.on_event("startup")
+async def start_write_queue():
+    await write_queue.start()  # replays rows journaled during an outage or before the last restart
+
+@app.on_event("shutdown")
+async def close_clients():
+    await write_queue.aclose()  # flush before the HTTP client goes away
+    await supabase_rest.aclose()
+    await config_cache.aclose()
+    await openai_pool.aclose()
+    acuity.close()
+
+@app.get("/healthz")
+def healthz():
+    # Liveness: the process is up and its event loop answers; says nothing about upstreams
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    # Readiness: startup hooks ran and the warm-up phase finished (or ran out of time)
+    if not warmup["ready"]:
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "ready", "warmed": len(warmup["clients"]), "failed": len(warmup["failed"])}
+
+@app.get("/debug/cache")
+def debug_cache(req: Request):
+    require_bearer(req, ADMIN_TOKEN)
+    return {"embeddings": embedding_cache.stats(), "answers": answer_cache.stats(), "openai": openai_pool.stats(),
+            "google": google_calendars.stats(), "rate_limits": rate_limits.stats(), "writes": write_queue.stats(),
+            "static": static_assets.stats(), "sessions": session_store.stats(), "warmup": warmup}
+
+@app.get("/metrics")
+def metrics(req: Request):
+    # Prometheus text format; scrape with authorization: {type: Bearer, credentials: <ADMIN_TOKEN>}
+    require_bearer(req, ADMIN_TOKEN)
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/debug/env")
 def debug_env(client_id: str = Query(...), token: str = Query("")):
     if token != API_TOKEN:
@@ -275,34 +621,189 @@ def provider_status(client_id: str, token: str = Query("")):
         "available_providers": status
     }
 
+@app.post("/admin/configs/{client_id}/invalidate")
+def invalidate_config(req: Request, client_id: str):
+    require_bearer(req, ADMIN_TOKEN)
+    config_cache.invalidate(client_id)
+    kb_search.invalidate(client_id)
+    answer_cache.invalidate(client_id)
+    return {"client_id": client_id, "status": "invalidated"}
+
 # ─── API Routes ───────────────────────────────────────────────────────────────
-@app.post("/chat")
-async def chat(req: Request):
-    p = await req.json()
+async def parse_chat_request(req: Request, p: dict):
     if p.get("token") != API_TOKEN:
         raise HTTPException(401, "Bad token")
     cid = p.get("client_id", "").strip()
     if not cid:
         raise HTTPException(400, "Missing client_id")
-    if rate_limited(req.client.host):
-        raise HTTPException(429, "Rate limit")
+    req.state.client_id = cid
+    reject_unknown_client(cid)
+    await aenforce_rate_limit(req, "chat", cid)
+    await afetch_config(cid)
+    reject_unknown_client(cid)
 
     q = p.get("question", "").strip()
-    if not q:
-        return {"answer": "Please ask a question 🙂"}
+    return cid, q, load_session(cid, p)
+
+def load_session(client_id: str, p: dict) -> Session:
+    # Turns and booking live server-side under session_id; older widgets that send their
+    # own history (Array of {user, bot} dicts) just seed a new session with it
+    sid = p.get("session_id")
+    session = session_store.get(sid) if sid else None
+    if session is None or session.client_id != client_id:
+        history = p.get("history") if isinstance(p.get("history"), list) else []
+        session = Session.new(client_id, history[-SESSION_KEEP_TURNS:])
+    if isinstance(p.get("booking"), dict):
+        session.booking = p["booking"]  # the widget drives the booking flow, so its latest state wins
+    return session
+
+def record_turn(session: Session, user_q: str, reply: str, oa: "AsyncOpenAI"):
+    session.turns.append({"user": user_q, "bot": reply})
+    session.turns = session.turns[-SESSION_MAX_TURNS:]
+    session_store.save(session)
+    if len(session.turns) - SESSION_KEEP_TURNS >= SESSION_COMPACT_EVERY and session.id not in _compacting:
+        _compacting.add(session.id)
+        task = asyncio.create_task(compact_session(session.id, oa))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+_compacting = set()
+
+async def compact_session(session_id: str, oa: "AsyncOpenAI"):
+    # Folds everything but the most recent turns into the rolling summary, off the request path
+    try:
+        s = session_store.get(session_id)
+        old = s.turns[:len(s.turns) - SESSION_KEEP_TURNS] if s else []
+        if not old:
+            return
+        with span("session_compact", s.client_id):
+            res = await oa.chat.completions.create(model=CHAT_MODEL, messages=[
+                {"role": "user", "content": summary_prompt(s.summary, old)}])
+        record_usage(s.client_id, CHAT_MODEL, res.usage)
+        summary = res.choices[0].message.content.strip()
+        s = session_store.get(session_id)  # turns may have been added meanwhile
+        if s and s.turns[:len(old)] == old:
+            s.summary = summary
+            s.turns = s.turns[len(old):]
+            session_store.save(s)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        _compacting.discard(session_id)
 
-    # NEW: Get optional conversation history
-    history = p.get("history", [])   # Array of {user, bot} dicts
-    booking = p.get("booking", {})   # <-- Add this line to receive booking info
+@app.post("/chat")
+async def chat(req: Request):
+    p = await req.json()
+    cid, q, session = await parse_chat_request(req, p)
+    if not q:
+        return {"answer": "Please ask a question 🙂", "session_id": session.id}
 
-    cfg = fetch_config(cid)
     oa  = get_openai_client(cid)
     try:
-        ans = answer(q, cid, cfg, oa, history, booking)
-        return {"answer": ans}
+        ans = await answer(q, cid, None, oa, session.turns, session.booking, session.summary)
+        record_turn(session, q, ans, oa)
+        return {"answer": ans, "session_id": session.id}
     except Exception:
         traceback.print_exc()
-        return {"answer": "Error occurred"}
+        return {"answer": "Error occurred", "session_id": session.id}
+
+def sse(data: dict, event: str = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(req: Request):
+    # Server-Sent Events: {"delta": ...} per chunk, then a final "done" event carrying the full answer
+    p = await req.json()
+    cid, q, session = await parse_chat_request(req, p)
+
+    async def events():
+        if not q:
+            yield sse({"answer": "Please ask a question 🙂", "session_id": session.id}, "done")
+            return
+        parts = []
+        try:
+            oa = get_openai_client(cid)
+            async for delta in answer_stream(q, cid, None, oa, session.turns, session.booking, session.summary):
+                parts.append(delta)
+                yield sse({"delta": delta})
+            ans = "".join(parts).strip()
+            record_turn(session, q, ans, oa)
+            yield sse({"answer": ans, "session_id": session.id}, "done")
+        except Exception:
+            traceback.print_exc()
+            yield sse({"answer": "".join(parts).strip() or "Error occurred", "session_id": session.id}, "error")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def book_google(cid: str, cfg: dict, dt: datetime.datetime, timezone: str, name: str, email: str,
+                purpose: str) -> str:
+    # Blocking end to end (token refresh under a per-tenant lock, free/busy, insert): /book runs it in the threadpool
+    duration_minutes = int(cfg.get("meetingDuration", 40))
+    window_end = (dt + timedelta(minutes=duration_minutes)).isoformat()
+    service, _ = get_calendar_service(cid)
+    calendar_id = "primary"  # ✅ Force primary to ensure email delivery
+
+    # One free/busy query covers the requested slot and the whole suggestion window
+    search_end = dt + timedelta(days=int(cfg.get("suggestionWindowDays", 3)))
+    freebusy_query = {
+        "timeMin": dt.isoformat(),
+        "timeMax": search_end.isoformat(),
+        "timeZone": timezone,
+        "items": [{"id": calendar_id}]
+    }
+    with span("google_freebusy", cid):
+        fb_result = service.freebusy().query(body=freebusy_query).execute()
+    busy = BusyIntervals.from_google(fb_result["calendars"][calendar_id].get("busy", []))
+    if busy.overlaps(dt, dt + timedelta(minutes=duration_minutes)):
+        by_day = generate_slots(dt.date(), search_end.date(), business_tz(cfg, timezone), cfg, busy,
+                                not_before=dt, limit=int(cfg.get("suggestionCount", 3)))
+        suggestions = [slot for day_slots in by_day.values() for slot in day_slots if slot < search_end]
+        if suggestions:
+            raise HTTPException(409, {
+                "error": "The selected time is not available.",
+                "suggested": suggestions[0].isoformat(),
+                "suggestions": [s.isoformat() for s in suggestions]
+            })
+        else:
+            raise HTTPException(409, {
+                "error": "The selected time is not available. Please choose another."
+            })
+
+    event = {
+        "summary": f"Meeting with {name}",
+        "description": f"Purpose: {purpose}",
+        "start": {
+            "dateTime": dt.isoformat(),
+            "timeZone": timezone
+        },
+        "end": {
+            "dateTime": window_end,
+            "timeZone": timezone
+        },
+        "attendees": [{"email": email}],
+        "conferenceData": {
+            "createRequest": {
+                "requestId": str(uuid4()),
+                "conferenceSolutionKey": {"type": "hangoutsMeet"}
+            }
+        },
+        "reminders": {
+            "useDefault": True
+        }
+    }
+
+    with span("google_insert", cid):
+        created = service.events().insert(
+            calendarId=calendar_id,
+            body=event,
+            conferenceDataVersion=1,
+            sendUpdates="all"
+        ).execute()
+
+    availability_cache.invalidate(cid)
+    return created.get("conferenceData", {}).get("entryPoints", [{}])[0].get("uri", "")
 
 @app.post("/book")
 async def book(req: Request):
@@ -318,8 +819,12 @@ async def book(req: Request):
 
     if not all([cid, name, email, dt_str]):
         raise HTTPException(400, {"error": "Missing booking parameters"})
+    req.state.client_id = cid
+    reject_unknown_client(cid)
+    await aenforce_rate_limit(req, "book", cid)
 
-    cfg = fetch_config(cid)
+    cfg = await afetch_config(cid, required=True)
+    reject_unknown_client(cid)
     provider = p.get("bookingProvider") or cfg.get("bookingProvider")
 
     try:
@@ -333,112 +838,16 @@ async def book(req: Request):
     if not is_within_available_hours(dt, cfg):
         raise HTTPException(409, {"error": "The selected time is outside available hours. Please choose a valid time."})
 
-    duration_minutes = int(cfg.get("meetingDuration", 40))
-    window_end = (dt + timedelta(minutes=duration_minutes)).isoformat()
-
     if provider == "google":
-        creds, _ = get_google_credentials_from_env(cid)
-        calendar_id = "primary"  # ✅ Force primary to ensure email delivery
-        service = build("calendar", "v3", credentials=creds)
-
-        # Check availability first
-        freebusy_query = {
-            "timeMin": dt.isoformat(),
-            "timeMax": window_end,
-            "timeZone": timezone,
-            "items": [{"id": calendar_id}]
-        }
-        fb_result = service.freebusy().query(body=freebusy_query).execute()
-        busy_times = fb_result["calendars"][calendar_id].get("busy", [])
-        if busy_times:
-            next_dt = dt
-            suggested = None
-            for _ in range(5):
-                next_dt += timedelta(minutes=30)
-                next_end = next_dt + timedelta(hours=1)
-                fb_query = {
-                    "timeMin": next_dt.isoformat(),
-                    "timeMax": next_end.isoformat(),
-                    "timeZone": timezone,
-                    "items": [{"id": calendar_id}]
-                }
-                fb_result = service.freebusy().query(body=fb_query).execute()
-                if not fb_result["calendars"][calendar_id].get("busy", []):
-                    suggested = next_dt
-                    break
-            if suggested:
-                raise HTTPException(409, {
-                    "error": "The selected time is not available.",
-                    "suggested": suggested.isoformat()
-                })
-            else:
-                raise HTTPException(409, {
-                    "error": "The selected time is not available. Please choose another."
-                })
-
-        purpose = p.get("purpose", "Appointment via 247Convo")
-        event = {
-            "summary": f"Meeting with {name}",
-            "description": f"Purpose: {purpose}",
-            "start": {
-                "dateTime": dt.isoformat(),
-                "timeZone": timezone
-            },
-            "end": {
-                "dateTime": window_end,
-                "timeZone": timezone
-            },
-            "attendees": [{"email": email}],
-            "conferenceData": {
-                "createRequest": {
-                    "requestId": str(uuid4()),
-                    "conferenceSolutionKey": {"type": "hangoutsMeet"}
-                }
-            },
-            "reminders": {
-                "useDefault": True
-            }
-        }
-
-        created = service.events().insert(
-            calendarId=calendar_id,
-            body=event,
-            conferenceDataVersion=1,
-            sendUpdates="all"
-        ).execute()
-
-        link = created.get("conferenceData", {}).get("entryPoints", [{}])[0].get("uri", "")
+        link = await run_in_threadpool(book_google, cid, cfg, dt, timezone, name, email,
+                                       p.get("purpose", "Appointment via 247Convo"))
 
     elif provider == "acuity":
-        prefix = cid.upper()
-        acuity_user = os.getenv(f"ACUITY_USER_ID_{prefix}")
-        acuity_key = os.getenv(f"ACUITY_API_KEY_{prefix}")
-        service_id = os.getenv(f"ACUITY_SERVICE_ID_{prefix}")
-        if not all([acuity_user, acuity_key, service_id]):
-            raise HTTPException(400, {"error": "Missing Acuity credentials"})
-
         purpose = p.get("purpose", "Appointment via 247Convo")
 
         # 1️⃣ First, get available slots from Acuity for this appointment type and date
         day_str = dt.strftime('%Y-%m-%d')
-        slots_url = "https://acuityscheduling.com/api/v1/availability/times"
-        slots_params = {
-            "appointmentTypeID": int(service_id),
-            "date": day_str,
-        }
-        slots_resp = requests.get(
-            slots_url,
-            auth=(acuity_user, acuity_key),
-            params=slots_params
-        )
-        if slots_resp.status_code >= 400:
-            raise HTTPException(
-                slots_resp.status_code,
-                {"error": f"Acuity error: {slots_resp.text}"}
-            )
-
-        slots = slots_resp.json()  # List of slots [{'time': '2025-08-02T15:00:00-04:00', ...}, ...]
-        slot_times = [s['time'] for s in slots]
+        slot_times = await run_in_threadpool(acuity_call, acuity.availability_times, cid, day_str)
 
         # 2️⃣ Check if requested time is available
         requested_iso = dt.isoformat()
@@ -464,117 +873,75 @@ async def book(req: Request):
                 )
 
         # 3️⃣ Book the appointment at the requested available time
-        res = requests.post(
-            "https://acuityscheduling.com/api/v1/appointments",
-            auth=(acuity_user, acuity_key),
-            json={
-                "firstName": name.split()[0],
-                "lastName": name.split()[-1],
-                "email": email,
-                "datetime": dt.isoformat(),
-                "appointmentTypeID": int(service_id),
-                "notes": purpose
-            }
+        created = await run_in_threadpool(
+            acuity_call, acuity.create_appointment, cid,
+            first_name=name.split()[0],
+            last_name=name.split()[-1],
+            email=email,
+            when=dt.isoformat(),
+            notes=purpose
         )
-        if res.status_code >= 400:
-            raise HTTPException(
-                res.status_code,
-                {"error": f"Acuity error: {res.text}"}
-            )
-        link = res.json().get("confirmationPage")
+        availability_cache.invalidate(cid)
+        link = created.get("confirmationPage")
 
 
 @app.get("/availability/{client_id}")
-def availability(client_id: str, date: str = Query(...), token: str = Query("")):
+def availability(req: Request, client_id: str, date: str = Query(...), token: str = Query("")):
     if token != API_TOKEN:
         raise HTTPException(401, "Bad token")
+    reject_unknown_client(client_id)
+    enforce_rate_limit(req, "availability", client_id)
 
-    cfg = fetch_config(client_id)
+    cfg = fetch_config(client_id, required=True)
+    reject_unknown_client(client_id)
     provider = cfg.get("bookingProvider", "google").lower()  # default to Google if missing
+    date_obj = parse_day(date)
 
     # --------- ACUITY HANDLING ---------
     if provider == "acuity":
-        prefix = client_id.upper()
-        acuity_user = os.getenv(f"ACUITY_USER_ID_{prefix}")
-        acuity_key = os.getenv(f"ACUITY_API_KEY_{prefix}")
-        service_id = os.getenv(f"ACUITY_SERVICE_ID_{prefix}")
-        if not all([acuity_user, acuity_key, service_id]):
-            raise HTTPException(400, {"error": "Missing Acuity credentials"})
-
-        # Fetch slots from Acuity for this appointment type and date
-        slots_url = "https://acuityscheduling.com/api/v1/availability/times"
-        slots_params = {
-            "appointmentTypeID": int(service_id),
-            "date": date,
-        }
-        slots_resp = requests.get(
-            slots_url,
-            auth=(acuity_user, acuity_key),
-            params=slots_params
-        )
-        if slots_resp.status_code >= 400:
-            raise HTTPException(
-                slots_resp.status_code,
-                {"error": f"Acuity error: {slots_resp.text}"}
-            )
-        slots = slots_resp.json()  # [{'time': '2025-08-02T15:00:00-04:00', ...}, ...]
         # Return in same shape as Google: ISO8601 string list
-        return {"slots": [s['time'] for s in slots]}
+        return {"slots": acuity_times(client_id, [date_obj])[date_obj.isoformat()]}
 
     # --------- GOOGLE HANDLING ---------
-    tzname = cfg.get("timezone", "UTC")
-    tz = pytz.timezone(tzname)
+    tz = pytz.timezone(cfg.get("timezone", "UTC"))
+    busy = google_busy(client_id, date_obj, date_obj, tz)
+    slots = generate_slots(date_obj, date_obj, tz, cfg, busy)[date_obj]
+    return {"slots": [s.isoformat() for s in slots]}
 
-    try:
-        date_obj = datetime.datetime.strptime(date, "%Y-%m-%d").date()
-    except:
-        raise HTTPException(400, {"error": "Invalid date"})
 
-    start_dt = tz.localize(datetime.datetime.combine(date_obj, datetime.time.min))
-    end_dt = start_dt + timedelta(days=1)
+@app.get("/availability/{client_id}/range")
+def availability_range(req: Request, client_id: str, start: str = Query(...), end: str = Query(...),
+                       token: str = Query("")):
+    # Slots for every day in [start, end] from a single upstream fetch
+    if token != API_TOKEN:
+        raise HTTPException(401, "Bad token")
+    reject_unknown_client(client_id)
+    enforce_rate_limit(req, "availability", client_id)
 
-    creds, calendar_id = get_google_credentials_from_env(client_id)
-    service = build("calendar", "v3", credentials=creds)
+    first_day, last_day = parse_day(start), parse_day(end)
+    if last_day < first_day:
+        raise HTTPException(400, {"error": "end must not be before start"})
+    if (last_day - first_day).days + 1 > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(400, {"error": f"Range is limited to {AVAILABILITY_MAX_DAYS} days"})
 
-    fb_result = service.freebusy().query(body={
-        "timeMin": start_dt.isoformat(),
-        "timeMax": end_dt.isoformat(),
-        "timeZone": tzname,
-        "items": [{"id": calendar_id}]
-    }).execute()
+    cfg = fetch_config(client_id, required=True)
+    reject_unknown_client(client_id)
+    provider = cfg.get("bookingProvider", "google").lower()
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
 
-    busy = fb_result["calendars"][calendar_id].get("busy", [])
-    duration = int(cfg.get("meetingDuration", 40))
-    available_hours = cfg.get("availableHours", {})
-    dayname = date_obj.strftime("%A").lower()
-    if dayname not in available_hours:
-        return {"slots": []}
-
-    s_hour, e_hour = available_hours[dayname]
-    s_h, s_m = map(int, s_hour.split(":"))
-    e_h, e_m = map(int, e_hour.split(":"))
-    slot_start = tz.localize(datetime.datetime.combine(date_obj, datetime.time(s_h, s_m)))
-    slot_end = tz.localize(datetime.datetime.combine(date_obj, datetime.time(e_h, e_m)))
-
-    # Generate possible slots
-    step = timedelta(minutes=30)
-    slots = []
-    current = slot_start
-    while current + timedelta(minutes=duration) <= slot_end:
-        overlap = any(busy_slot["start"] < (current + timedelta(minutes=duration)).isoformat()
-                    and busy_slot["end"] > current.isoformat() for busy_slot in busy)
-        if not overlap:
-            slots.append(current.isoformat())
-        current += step
-
-    return {"slots": slots}
+    if provider == "acuity":
+        return {"days": acuity_times(client_id, days)}
+
+    tz = pytz.timezone(cfg.get("timezone", "UTC"))
+    busy = google_busy(client_id, first_day, last_day, tz)
+    by_day = generate_slots(first_day, last_day, tz, cfg, busy)
+    return {"days": {d.isoformat(): [s.isoformat() for s in slots] for d, slots in by_day.items()}}
 
 
 @app.get("/availability/{client_id}/busy")
 def availability_busy(client_id: str, date: str = Query(...)):
     cfg = fetch_config(client_id)
-    creds, cal_id = get_google_credentials_from_env(client_id)
-    service = build("calendar", "v3", credentials=creds)
+    service, cal_id = get_calendar_service(client_id)
 
     date_start = parser.isoparse(date + "T00:00:00Z")
     date_end   = parser.isoparse(date + "T23:59:59Z")
@@ -599,14 +966,15 @@ async def summary(req: Request):
     name, email, log, cid = p.get("name"), p.get("email"), p.get("chat_log"), p.get("client_id")
     if not all([name, email, log, cid]):
         raise HTTPException(400, {"error": "Missing fields"})
-    supabase.table(TABLE_LOG).insert({
+    # Queued: written in bulk in the background, journaled to disk if Supabase is down
+    write_queue.put(TABLE_LOG, {
         "name": name,
         "email": email,
         "chat_log": log,
         "client_id": cid,
         "token": p["token"],
         "timestamp": datetime.datetime.utcnow().isoformat()
-    }).execute()
+    })
     return {"status": "saved"}
 
 @app.post("/rating")
@@ -620,40 +988,90 @@ async def rating(req: Request):
     created = datetime.datetime.utcnow().isoformat()
     # Insert into chat_ratings table (your schema)
     try:
-        supabase.table("chat_ratings").insert({
+        write_queue.put("chat_ratings", {
             "client_id": client_id,
             "name": name,
             "email": email,
             "score": int(score) if score else None,
             "context": json.dumps(context),  # Store as JSONB
             "created_at": created
-        }).execute()
+        })
         return {"status": "ok"}
     except Exception as e:
         return JSONResponse({"error": f"Could not save rating: {str(e)}"}, status_code=500)
 
+# Exportable log tables; the token /summary stores with each conversation is deliberately left out
+EXPORTS = {
+    "conversations": ExportSpec(TABLE_LOG, "timestamp", ("id", "client_id", "name", "email", "chat_log", "timestamp")),
+    "ratings": ExportSpec("chat_ratings", "created_at",
+                          ("id", "client_id", "name", "email", "score", "context", "created_at")),
+}
+
+@app.get("/export/{client_id}/{kind}")
+async def export_rows(req: Request, client_id: str, kind: str, format: str = Query("ndjson"),
+                      since: str = Query(""), until: str = Query(""), cursor: str = Query(""),
+                      limit: int = Query(0, ge=0)):
+    # Streams one client's rows oldest first; since is inclusive, until exclusive; see exports.py for cursor.
+    # Authorization: Bearer EXPORT_TOKEN (all clients) or EXPORT_TOKEN_<CLIENT_ID> (that client only)
+    require_bearer(req, EXPORT_TOKEN, os.getenv(export_token_env_name(client_id)))
+    spec = EXPORTS.get(kind)
+    if spec is None:
+        raise HTTPException(404, {"error": f"Unknown export '{kind}'"})
+    if format not in FORMATS:
+        raise HTTPException(400, {"error": "format must be ndjson or csv"})
+    req.state.client_id = client_id
+    await aenforce_rate_limit(req, "export", client_id)
+    try:
+        since, until, after = parse_bound(since, "since"), parse_bound(until, "until"), parse_cursor(cursor)
+    except ExportError as e:
+        raise HTTPException(400, {"error": str(e)})
+
+    pages = iter_pages(supabase_rest, spec, client_id, since, until, after, EXPORT_PAGE_SIZE, limit or None)
+    try:
+        # First page before the 200 goes out, so an unreachable Supabase is still a proper error
+        first = await timed("export_page", client_id, anext(pages, []))
+    except SupabaseError as e:
+        await pages.aclose()
+        raise HTTPException(502, {"error": f"Export failed: Supabase error {e.status_code}"})
+    except httpx.HTTPError as e:
+        await pages.aclose()
+        raise HTTPException(502, {"error": f"Export failed: {e.__class__.__name__}"})
+
+    async def body():
+        try:
+            rows = first
+            if format == "csv":
+                yield csv_chunk(rows, spec.columns, header=True)
+            else:
+                yield ndjson_chunk(rows)
+            while rows:
+                rows = await timed("export_page", client_id, anext(pages, []))
+                if rows:
+                    yield csv_chunk(rows, spec.columns) if format == "csv" else ndjson_chunk(rows)
+        except Exception:
+            traceback.print_exc()  # headers are gone; the truncated stream is the error signal
+            raise
+        finally:
+            await pages.aclose()
+
+    ext = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(body(), media_type=FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="{client_id}-{kind}.{ext}"',
+        "Cache-Control": "no-store",
+    })
+
 
 @app.get("/configs/{client_id}.json")
-async def get_config_file(client_id: str):
-    fp = os.path.join("configs", f"{client_id}.json")
-    if not os.path.exists(fp):
+async def get_config_file(client_id: str, request: Request):
+    asset = await run_in_threadpool(config_files.get, f"{client_id}.json")
+    if asset is None:
         raise HTTPException(404, {"error": "Not found"})
-    data = open(fp, "rb").read()
-    return Response(
-        content=data,
-        media_type="application/json",
-        headers={"Access-Control-Allow-Origin": "*"}
-    )
+    return asset_response(asset, request, f"public, max-age={CONFIG_FILE_MAX_AGE}")
 
 @app.get("/static/{path:path}")
-async def static_file(path: str):
-    fp = os.path.join("static", path)
-    if not os.path.exists(fp):
+async def static_file(path: str, request: Request):
+    # Served from memory; the file is re-read only when its mtime or size changes
+    asset = await run_in_threadpool(static_assets.get, path)
+    if asset is None:
         raise HTTPException(404, {"error": "Not found"})
-    data = open(fp, "rb").read()
-    mt = "text/html" if fp.endswith(".html") else "application/octet-stream"
-    return Response(
-        content=data,
-        media_type=mt,
-        headers={"Access-Control-Allow-Origin": "*"}
-    )
+    return asset_response(asset, request, f"public, max-age={STATIC_MAX_AGE}")
@@ -0,0 +1,232 @@
+# File: config_cache.py
+# Process-wide client config cache: TTL, stale-while-revalidate, ETag revalidation, negative caching
+
+import asyncio
+import collections
+import threading
+import time
+
+import httpx
+
+
+class ConfigUnavailable(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ("data", "etag", "fetched_at", "missing")
+
+    def __init__(self, data: dict, etag: str = None, missing: bool = False):
+        self.data = data
+        self.etag = etag
+        self.missing = missing
+        self.fetched_at = time.time()
+
+
+class ConfigCache:
+    def __init__(self, base_url: str, ttl: float = 60, stale_ttl: float = 600,
+                 negative_ttl: float = 30, timeout: float = 2, max_entries: int = 1000):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_entries = max_entries  # client_ids come from requests, so every per-client map is LRU-bounded
+        self._session = None  # requests.Session for the sync path, built on first use
+        self._aclient = None
+        self._entries = collections.OrderedDict()
+        self._locks = collections.OrderedDict()
+        self._alocks = collections.OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self._guard = threading.Lock()
+
+    # ── shared bookkeeping ──
+    def _state(self, e: _Entry) -> str:
+        age = time.time() - e.fetched_at
+        if age < (self.negative_ttl if e.missing else self.ttl):
+            return "fresh"
+        if not e.missing and age < self.ttl + self.stale_ttl:
+            return "stale"
+        return "expired"
+
+    def _lookup(self, client_id: str) -> _Entry:
+        with self._guard:
+            e = self._entries.get(client_id)
+            if e is not None:
+                self._entries.move_to_end(client_id)
+            return e
+
+    def _bounded(self, table: collections.OrderedDict, client_id: str, make):
+        # Call with self._guard held. Evicting a lock someone holds at worst lets one duplicate fetch through.
+        value = table.get(client_id)
+        if value is None:
+            value = table[client_id] = make()
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+        table.move_to_end(client_id)
+        return value
+
+    def known_missing(self, client_id: str) -> bool:
+        # True while the config host's 404 for client_id is negatively cached; callers reject the request
+        # before building any per-client state for it
+        e = self._entries.get(client_id)
+        return e is not None and e.missing and self._state(e) == "fresh"
+
+    def _url(self, client_id: str) -> str:
+        return f"{self.base_url}/{client_id}.json"
+
+    def _conditional_headers(self, client_id: str) -> dict:
+        prev = self._entries.get(client_id)
+        if prev is not None and prev.etag and not prev.missing:
+            return {"If-None-Match": prev.etag}
+        return {}
+
+    def _store(self, client_id: str, status: int, etag: str, read_json) -> _Entry:
+        prev = self._entries.get(client_id)
+        if status == 304 and prev is not None:
+            prev.fetched_at = time.time()
+            return prev
+        if status == 404:
+            e = _Entry({}, missing=True)
+        elif 200 <= status < 300:
+            e = _Entry(read_json(), etag=etag)
+        else:
+            raise ConfigUnavailable(f"Config host returned {status} for '{client_id}'")
+        with self._guard:
+            self._entries[client_id] = e
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return e
+
+    def _claim_refresh(self, client_id: str) -> bool:
+        with self._guard:
+            if client_id in self._refreshing:
+                return False
+            self._refreshing.add(client_id)
+            return True
+
+    def _release_refresh(self, client_id: str):
+        with self._guard:
+            self._refreshing.discard(client_id)
+
+    def invalidate(self, client_id: str = None):
+        with self._guard:
+            if client_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(client_id, None)
+
+    # ── sync path (threadpool routes) ──
+    def _lock_for(self, client_id: str) -> threading.Lock:
+        with self._guard:
+            return self._bounded(self._locks, client_id, threading.Lock)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._guard:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+        return self._session
+
+    def _fetch(self, client_id: str) -> _Entry:
+        r = self.session.get(self._url(client_id), headers=self._conditional_headers(client_id),
+                             timeout=self.timeout)
+        return self._store(client_id, r.status_code, r.headers.get("ETag"), r.json)
+
+    def get(self, client_id: str) -> dict:
+        e = self._lookup(client_id)
+        if e is not None:
+            state = self._state(e)
+            if state == "fresh":
+                return e.data
+            if state == "stale":
+                self._refresh_in_background(client_id)
+                return e.data
+
+        with self._lock_for(client_id):
+            e = self._entries.get(client_id)
+            if e is not None and self._state(e) == "fresh":
+                return e.data
+            try:
+                return self._fetch(client_id).data
+            except Exception as exc:
+                if e is not None and not e.missing:
+                    return e.data  # stale-if-error beats failing the request
+                raise ConfigUnavailable(f"Config for '{client_id}' unavailable: {exc}") from exc
+
+    def _refresh_in_background(self, client_id: str):
+        if not self._claim_refresh(client_id):
+            return
+
+        def run():
+            try:
+                with self._lock_for(client_id):
+                    self._fetch(client_id)
+            except Exception:
+                pass  # keep serving the stale copy; next expiry retries
+            finally:
+                self._release_refresh(client_id)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # ── async path (event-loop routes) ──
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        if self._aclient is None or self._aclient.is_closed:
+            self._aclient = httpx.AsyncClient(timeout=self.timeout)
+        return self._aclient
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def _alock_for(self, client_id: str) -> asyncio.Lock:
+        with self._guard:
+            return self._bounded(self._alocks, client_id, asyncio.Lock)
+
+    async def _afetch(self, client_id: str) -> _Entry:
+        r = await self.aclient.get(self._url(client_id), headers=self._conditional_headers(client_id))
+        return self._store(client_id, r.status_code, r.headers.get("ETag"), r.json)
+
+    async def aget(self, client_id: str) -> dict:
+        e = self._lookup(client_id)
+        if e is not None:
+            state = self._state(e)
+            if state == "fresh":
+                return e.data
+            if state == "stale":
+                self._arefresh_in_background(client_id)
+                return e.data
+
+        async with self._alock_for(client_id):
+            e = self._entries.get(client_id)
+            if e is not None and self._state(e) == "fresh":
+                return e.data
+            try:
+                return (await self._afetch(client_id)).data
+            except Exception as exc:
+                if e is not None and not e.missing:
+                    return e.data
+                raise ConfigUnavailable(f"Config for '{client_id}' unavailable: {exc}") from exc
+
+    def _arefresh_in_background(self, client_id: str):
+        if not self._claim_refresh(client_id):
+            return
+
+        async def run():
+            try:
+                async with self._alock_for(client_id):
+                    await self._afetch(client_id)
+            except Exception:
+                pass
+            finally:
+                self._release_refresh(client_id)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,105 @@
+# File: embedding_cache.py
+# Bounded LRU cache for query embeddings, optionally backed by SQLite so it survives restarts
+
+import collections
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_items: int = 5000, path: str = None, max_disk_items: int = 100000):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL, used_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._items[key] = vec
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def get(self, model: str, text: str):
+        key = cache_key(model, text)
+        with self._lock:
+            vec = self._items.get(key)
+            if vec is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return vec
+            if self._db is not None:
+                row = self._db.execute("SELECT vec FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vec = np.frombuffer(row[0], dtype=np.float32)
+                    self._db.execute("UPDATE embeddings SET used_at = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, vec)
+                    self.hits += 1
+                    return vec
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding) -> np.ndarray:
+        key = cache_key(model, text)
+        vec = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vec)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vec, used_at) VALUES (?, ?, ?)",
+                    (key, vec.tobytes(), time.time()),
+                )
+                self._puts += 1
+                if self._puts % 500 == 0:
+                    self._prune_disk()
+                self._db.commit()
+        return vec
+
+    def contains(self, model: str, text: str) -> bool:
+        key = cache_key(model, text)
+        with self._lock:
+            if key in self._items:
+                return True
+            return bool(self._db and self._db.execute(
+                "SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone())
+
+    def _prune_disk(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_disk_items:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used_at LIMIT ?)",
+                (count - self.max_disk_items,),
+            )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_items": self.max_items,
+            "disk": self._db is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,98 @@
+# File: exports.py
+# Per-client export of logged conversations and ratings: keyset pages over (timestamp, id), streamed as NDJSON or CSV
+#
+# Rows come out oldest first. A page is fetched only when the previous one has been written, so memory stays at
+# one page however large the tenant. Every row carries its timestamp and id; pass them back as
+# cursor=<timestamp>,<id> to resume an interrupted export right after that row.
+
+import collections
+import csv
+import datetime
+import io
+import json
+
+from supabase_rest import and_, cond, eq, or_, where
+
+ExportSpec = collections.namedtuple("ExportSpec", "table ts_column columns")
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_bound(value: str, name: str):
+    # "YYYY-MM-DD" or an ISO datetime → ISO string PostgREST compares against the timestamp column; None if unset
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        raise ExportError(f"Invalid {name}: expected YYYY-MM-DD or an ISO 8601 datetime")
+
+
+def parse_cursor(value: str):
+    # "<timestamp>,<id>" of the last row already received → (timestamp, id); None if unset
+    if not value:
+        return None
+    ts, _, row_id = value.rpartition(",")
+    try:
+        return ts, int(row_id)
+    except ValueError:
+        raise ExportError("Invalid cursor: expected <timestamp>,<id> of the last row received")
+
+
+def page_filters(spec: ExportSpec, client_id: str, since: str = None, until: str = None, after: tuple = None) -> dict:
+    conds = []
+    if since:
+        conds.append(cond(spec.ts_column, "gte", since))
+    if until:
+        conds.append(cond(spec.ts_column, "lt", until))
+    if after:
+        # Strictly after the last row: later timestamp, or same timestamp and higher id (timestamps can tie)
+        ts, row_id = after
+        conds.append(or_(cond(spec.ts_column, "gt", ts),
+                         and_(cond(spec.ts_column, "eq", ts), cond("id", "gt", row_id))))
+    return {"client_id": eq(client_id), **where(*conds)}
+
+
+async def iter_pages(rest, spec: ExportSpec, client_id: str, since: str = None, until: str = None,
+                     after: tuple = None, page_size: int = 1000, limit: int = None):
+    # Async generator of row lists; each page's last row is the next page's cursor
+    left = limit
+    while left is None or left > 0:
+        size = page_size if left is None else min(page_size, left)
+        rows = await rest.select(spec.table, ",".join(spec.columns),
+                                 filters=page_filters(spec, client_id, since, until, after),
+                                 order=f"{spec.ts_column}.asc,id.asc", limit=size)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < size:
+            return
+        after = (rows[-1][spec.ts_column], rows[-1]["id"])
+        if left is not None:
+            left -= len(rows)
+
+
+def ndjson_chunk(rows: list) -> str:
+    return "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+
+
+def csv_chunk(rows: list, columns: tuple, header: bool = False) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    if header:
+        w.writerow(columns)
+    for row in rows:
+        w.writerow([_cell(row.get(c)) for c in columns])
+    return buf.getvalue()
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
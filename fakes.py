@@ -0,0 +1,445 @@
+# File: fakes.py
+# Local stand-ins for upstream services (OpenAI, PostgREST, config host, Google, Acuity) for offline runs
+
+import base64
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class _FakeServer:
+    # Runs a ThreadingHTTPServer on 127.0.0.1:<free port> in a daemon thread; use as a context manager
+    handler = BaseHTTPRequestHandler
+
+    def __init__(self):
+        fake = self
+
+        class Handler(self.handler):
+            protocol_version = "HTTP/1.1"
+            server_fake = fake
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def read_form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return dict(urllib.parse.parse_qsl(self.rfile.read(length).decode("utf-8")))
+
+    def send_sse(self, events: list):
+        # Chunked text/event-stream, one chunk per event, then the [DONE] sentinel
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for data in [json.dumps(e) for e in events] + ["[DONE]"]:
+            chunk = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _AcuityHandler(_JSONHandler):
+    def _gate(self) -> bool:
+        fake = self.server_fake
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+            failure = fake.failures.pop(0) if fake.failures else None
+        if fake.delay:
+            time.sleep(fake.delay)
+        if failure:
+            # Drain the body first: left unread it would be parsed as the next request on this keep-alive connection
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_json(failure, {"error": "injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._gate():
+            return
+        url = urllib.parse.urlparse(self.path)
+        if url.path.endswith("/availability/times"):
+            date = urllib.parse.parse_qs(url.query).get("date", [""])[0]
+            times = self.server_fake.times.get(date, [])
+            return self.send_json(200, [{"time": t, "slotsAvailable": 1} for t in times])
+        self.send_json(404, {"error": "not_found"})
+
+    def do_POST(self):
+        if not self._gate():
+            return
+        if self.path.endswith("/appointments"):
+            body = self.read_json()
+            fake = self.server_fake
+            with fake.lock:
+                fake.appointments.append(body)
+                appt_id = len(fake.appointments)
+            return self.send_json(200, {"id": appt_id, "confirmationPage": f"{fake.url}/confirm/{appt_id}", **body})
+        self.send_json(404, {"error": "not_found"})
+
+
+class FakeAcuityServer(_FakeServer):
+    # times: {"YYYY-MM-DD": [iso, ...]}; fail_next(503, 503) makes the next two requests fail
+    handler = _AcuityHandler
+
+    def __init__(self, times: dict = None, delay: float = 0.0):
+        super().__init__()
+        self.times = times or {}
+        self.delay = delay
+        self.failures = []
+        self.requests = []
+        self.appointments = []
+        self.lock = threading.Lock()
+
+    def fail_next(self, *statuses: int):
+        with self.lock:
+            self.failures.extend(statuses)
+
+
+def fake_embedding(text: str, dim: int = 1536) -> np.ndarray:
+    # Deterministic unit vector per text, so a KB built from the same strings scores 1.0 against them
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class _OpenAIHandler(_JSONHandler):
+    def do_POST(self):
+        fake = self.server_fake
+        body = self.read_json()
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+        if fake.delay:
+            time.sleep(fake.delay)
+        if self.path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            data = []
+            for i, text in enumerate(inputs):
+                vec = fake_embedding(text, fake.dim)
+                emb = (base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+                       if body.get("encoding_format") == "base64" else vec.tolist())
+                data.append({"object": "embedding", "index": i, "embedding": emb})
+            tokens = sum(len(t.split()) for t in inputs)
+            return self.send_json(200, {"object": "list", "data": data, "model": body.get("model"),
+                                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+        if self.path.endswith("/chat/completions"):
+            prompt = body["messages"][-1]["content"]
+            reply = fake.reply
+            usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(reply.split()),
+                     "total_tokens": len(prompt.split()) + len(reply.split())}
+            base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model")}
+            if body.get("stream"):
+                words = reply.split(" ")
+                events = [{**base, "object": "chat.completion.chunk",
+                           "choices": [{"index": 0, "delta": {"content": w if i == 0 else " " + w},
+                                        "finish_reason": None}]} for i, w in enumerate(words)]
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+                return self.send_sse(events)
+            return self.send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]})
+        self.send_json(404, {"error": "not_found"})
+
+
+class FakeOpenAIServer(_FakeServer):
+    # Embeddings from fake_embedding(); every completion returns `reply`. Point OPENAI_BASE_URL at url + "/v1"
+    handler = _OpenAIHandler
+
+    def __init__(self, dim: int = 1536, reply: str = "This is a canned answer.", delay: float = 0.0):
+        super().__init__()
+        self.dim = dim
+        self.reply = reply
+        self.delay = delay
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+_COMPARE = {"gt": lambda a, b: a > b, "gte": lambda a, b: a >= b, "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b}
+
+
+def _unquote(arg: str) -> str:
+    if len(arg) >= 2 and arg[0] == arg[-1] == '"':
+        return arg[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return arg
+
+
+def _match(value, op: str) -> bool:
+    kind, _, arg = op.partition(".")
+    arg = _unquote(arg)
+    if kind == "eq":
+        return str(value) == arg
+    if kind == "in":
+        return str(value) in {a.strip('"') for a in arg.strip("()").split(",")}
+    if kind == "is":
+        return value is None if arg == "null" else str(value).lower() == arg
+    if kind in _COMPARE:
+        if value is None:
+            return False
+        # Numbers compare as numbers; ISO timestamps and other text compare as strings, which orders them correctly
+        other = type(value)(arg) if isinstance(value, (int, float)) else arg
+        return _COMPARE[kind](value if isinstance(value, (int, float)) else str(value), other)
+    return False
+
+
+def _split_top(text: str) -> list:
+    # Splits "a,b(c,d),e" on commas outside parentheses and double quotes
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        ch = text[i]
+        if quoted and ch == "\\":
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return [p for p in parts if p]
+
+
+def _match_tree(row: dict, logic: str, body: str) -> bool:
+    # PostgREST logical filters: and=(c1,c2,or(c3,and(c4,c5))) where each c is column.op.value
+    results = []
+    for part in _split_top(body.strip()[1:-1]):
+        if part.startswith(("and(", "or(")):
+            kind, _, rest = part.partition("(")
+            results.append(_match_tree(row, kind, "(" + rest))
+        else:
+            column, _, op = part.partition(".")
+            results.append(_match(row.get(column), op))
+    return all(results) if logic == "and" else any(results)
+
+
+def _row_matches(row: dict, filters) -> bool:
+    return all(_match_tree(row, k, v) if k in ("and", "or") else _match(row.get(k), v) for k, v in filters)
+
+
+class _PostgrestHandler(_JSONHandler):
+    # Enough of PostgREST for supabase_rest.AsyncPostgrest and supabase-py inserts: select with
+    # eq/in/is/gt/gte/lt/lte filters and and=/or= trees, multi-column order, limit/offset; insert; rpc/match_documents
+    def do_GET(self):
+        fake = self.server_fake
+        url = urllib.parse.urlparse(self.path)
+        table = url.path.rsplit("/", 1)[-1]
+        params = urllib.parse.parse_qsl(url.query)
+        reserved = {"select", "order", "limit", "offset"}
+        q = dict(params)
+        filters = [(k, v) for k, v in params if k not in reserved]
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+            rows = fake.tables.get(table, [])
+            id_filter = dict(filters).get("id", "")
+            if id_filter.startswith("in."):
+                # Batched id lookups are the hot path; don't scan the table for them
+                wanted = [int(a) for a in id_filter[3:].strip("()").split(",") if a]
+                by_id = fake.index(table)
+                rows = [by_id[i] for i in wanted if i in by_id]
+                rows = [r for r in rows if _row_matches(r, filters)]
+            elif any(k in ("and", "or") for k, _ in filters):
+                # Keyset cursors change every page, so these aren't worth memoizing
+                rows = [r for r in rows if _row_matches(r, filters)]
+            else:
+                rows = fake.filtered(table, tuple(filters))
+        columns = [c for c in q.get("select", "*").split(",") if c]
+        if columns != ["*"] and rows and any(c not in rows[0] for c in columns):
+            missing = next(c for c in columns if c not in rows[0])
+            return self.send_json(400, {"code": "42703", "details": None, "hint": None,
+                                        "message": f"column {table}.{missing} does not exist"})
+        for term in reversed(q.get("order", "").split(",")):
+            if term:
+                col, _, direction = term.partition(".")
+                rows = sorted(rows, key=lambda r: r.get(col), reverse=direction.startswith("desc"))
+        offset = int(q.get("offset") or 0)
+        limit = int(q["limit"]) if q.get("limit") else None
+        rows = rows[offset:offset + limit if limit is not None else None]
+        if columns != ["*"]:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        self.send_json(200, rows)
+
+    def do_POST(self):
+        fake = self.server_fake
+        body = self.read_json()
+        path = urllib.parse.urlparse(self.path).path
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+        if "/rpc/" in path:
+            return self.send_json(200, fake.match_documents(body))
+        table = path.rsplit("/", 1)[-1]
+        rows = body if isinstance(body, list) else [body]
+        with fake.lock:
+            stored = fake.insert(table, rows)
+        self.send_json(201, stored)
+
+
+class FakeSupabaseServer(_FakeServer):
+    # tables: {"client_knowledge_base": [{"id", "client_id", "content", "embedding_f32", ...}], ...}
+    handler = _PostgrestHandler
+
+    def __init__(self, tables: dict = None):
+        super().__init__()
+        self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+        self._indexes = {}
+        self._filtered = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def index(self, table: str) -> dict:
+        rows = self.tables.get(table, [])
+        idx = self._indexes.get(table)
+        if idx is None or idx[0] != len(rows):
+            idx = (len(rows), {r["id"]: r for r in rows if "id" in r})
+            self._indexes[table] = idx
+        return idx[1]
+
+    def filtered(self, table: str, filters: tuple) -> list:
+        # Paged listings repeat the same filter; scan once per table size instead of once per page
+        rows = self.tables.get(table, [])
+        key = (table, filters)
+        hit = self._filtered.get(key)
+        if hit is None or hit[0] != len(rows):
+            hit = (len(rows), [r for r in rows if _row_matches(r, filters)])
+            self._filtered[key] = hit
+        return hit[1]
+
+    def insert(self, table: str, rows: list) -> list:
+        existing = self.tables.setdefault(table, [])
+        next_id = max((r.get("id", 0) for r in existing), default=0) + 1
+        stored = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", next_id)
+            next_id = max(next_id, row["id"]) + 1
+            existing.append(row)
+            stored.append(row)
+        return stored
+
+    def match_documents(self, body: dict) -> list:
+        q = np.asarray(body["query_embedding"], dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        with self.lock:
+            rows = [r for r in self.tables.get("client_knowledge_base", [])
+                    if r.get("client_id") == body["match_client_id"] and r.get("embedding_f32")]
+        scored = []
+        for r in rows:
+            v = np.frombuffer(base64.b64decode(r["embedding_f32"]), dtype="<f4")
+            scored.append((float(v @ q / (np.linalg.norm(v) or 1.0)), r))
+        scored.sort(key=lambda s: -s[0])
+        return [{"id": r["id"], "content": r.get("content"), "similarity": score}
+                for score, r in scored[:body.get("match_count", 1)]]
+
+
+class _ConfigHandler(_JSONHandler):
+    def do_GET(self):
+        fake = self.server_fake
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+        name = urllib.parse.urlparse(self.path).path.rsplit("/", 1)[-1]
+        cfg = fake.configs.get(name[:-len(".json")] if name.endswith(".json") else name)
+        if cfg is None:
+            return self.send_json(404, {"error": "not_found"})
+        etag = '"%s"' % hashlib.sha256(json.dumps(cfg, sort_keys=True).encode()).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, cfg, {"ETag": etag})
+
+
+class FakeConfigServer(_FakeServer):
+    # Serves {client_id: config} at /configs/<client_id>.json with ETags; point CONFIG_URL_BASE at url + "/configs"
+    handler = _ConfigHandler
+
+    def __init__(self, configs: dict = None):
+        super().__init__()
+        self.configs = configs or {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+class _GoogleHandler(_JSONHandler):
+    def do_POST(self):
+        fake = self.server_fake
+        path = urllib.parse.urlparse(self.path).path
+        with fake.lock:
+            fake.requests.append((self.command, self.path))
+        if fake.delay:
+            time.sleep(fake.delay)
+        if path == "/token":
+            self.read_form()
+            return self.send_json(200, {"access_token": f"fake-{time.time()}", "expires_in": 3600,
+                                        "token_type": "Bearer"})
+        body = self.read_json()
+        if path.endswith("/freeBusy"):
+            calendars = {item["id"]: {"busy": fake.busy.get(item["id"], [])} for item in body.get("items", [])}
+            return self.send_json(200, {"kind": "calendar#freeBusy", "calendars": calendars})
+        if path.endswith("/events"):
+            with fake.lock:
+                fake.events.append(body)
+                event_id = len(fake.events)
+            return self.send_json(200, {"id": str(event_id), **body, "conferenceData": {
+                "entryPoints": [{"entryPointType": "video", "uri": f"https://meet.example/{event_id}"}]}})
+        self.send_json(404, {"error": "not_found"})
+
+
+class FakeGoogleServer(_FakeServer):
+    # busy: {calendar_id: [{"start": iso, "end": iso}]}; set GOOGLE_TOKEN_URI=url + "/token"
+    # and GOOGLE_CALENDAR_URL=url + "/calendar/v3/"
+    handler = _GoogleHandler
+
+    def __init__(self, busy: dict = None, delay: float = 0.0):
+        super().__init__()
+        self.busy = busy or {}
+        self.delay = delay
+        self.events = []
+        self.requests = []
+        self.lock = threading.Lock()
@@ -0,0 +1,126 @@
+# File: google_calendar.py
+# Per-tenant cache of refreshed Google credentials and built Calendar service objects.
+# The Google client libraries are imported on first use, so tenants without Google never pay for them.
+
+import datetime
+import json
+import os
+import threading
+
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+
+class MissingGoogleToken(Exception):
+    pass
+
+
+class GoogleNotConfigured(MissingGoogleToken):
+    # GOOGLE_CLIENT_ID / GOOGLE_CLIENT_SECRET unset: Google booking is off for this deployment
+    pass
+
+
+def token_env_name(client_id: str) -> str:
+    return f"GOOGLE_OAUTH_TOKEN_{client_id.upper().replace('-', '_')}"
+
+
+class _Tenant:
+    __slots__ = ("token_json", "creds", "calendar_id", "service", "lock")
+
+    def __init__(self, token_json: str, creds, calendar_id: str, service):
+        self.token_json = token_json
+        self.creds = creds
+        self.calendar_id = calendar_id
+        self.service = service
+        self.lock = threading.Lock()
+
+
+class GoogleCalendarRegistry:
+    def __init__(self, client_id: str, client_secret: str, refresh_margin: float = 300,
+                 token_uri: str = TOKEN_URI, api_endpoint: str = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self.token_uri = token_uri
+        self.api_endpoint = api_endpoint  # e.g. a local fake's ".../calendar/v3/"; None = Google
+        self._tenants = {}
+        self._guard = threading.Lock()
+        self.builds = 0
+        self.refreshes = 0
+
+    def _build_service(self, creds):
+        import google_auth_httplib2
+        import httplib2
+        from googleapiclient.discovery import build
+        from googleapiclient.http import HttpRequest
+
+        # httplib2.Http isn't thread-safe, so each request gets its own transport; the parsed
+        # discovery document (the expensive part) and the credentials are shared
+        def request_builder(http, *args, **kwargs):
+            return HttpRequest(google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http()), *args, **kwargs)
+
+        options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+        return build("calendar", "v3", credentials=creds, cache_discovery=False,
+                     static_discovery=True, requestBuilder=request_builder, client_options=options)
+
+    def _load(self, client_id: str, token_json: str) -> _Tenant:
+        from google.oauth2.credentials import Credentials
+
+        info = json.loads(token_json)
+        creds = Credentials(
+            token=info["access_token"],
+            refresh_token=info["refresh_token"],
+            token_uri=self.token_uri,
+            client_id=self.client_id,
+            client_secret=self.client_secret
+        )
+        self.builds += 1
+        return _Tenant(token_json, creds, info["calendar_id"], self._build_service(creds))
+
+    def _needs_refresh(self, creds) -> bool:
+        if not creds.refresh_token:
+            return False
+        # Unknown expiry (fresh from env) is refreshed once so later checks can be proactive
+        if creds.expiry is None or not creds.token:
+            return True
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now < self.refresh_margin
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    def has_token(self, client_id: str) -> bool:
+        return bool(os.getenv(token_env_name(client_id)))
+
+    def get(self, client_id: str):
+        if not self.configured:
+            raise GoogleNotConfigured(client_id)
+        token_json = os.getenv(token_env_name(client_id))
+        if not token_json:
+            raise MissingGoogleToken(client_id)
+        tenant = self._tenants.get(client_id)
+        if tenant is None or tenant.token_json != token_json:
+            with self._guard:
+                tenant = self._tenants.get(client_id)
+                if tenant is None or tenant.token_json != token_json:
+                    tenant = self._load(client_id, token_json)
+                    self._tenants[client_id] = tenant
+        if self._needs_refresh(tenant.creds):
+            with tenant.lock:
+                # Whoever waited on the lock re-checks, so only one request refreshes
+                if self._needs_refresh(tenant.creds):
+                    from google.auth.transport.requests import Request as GoogleRequest
+                    tenant.creds.refresh(GoogleRequest())
+                    self.refreshes += 1
+        return tenant.service, tenant.calendar_id
+
+    def invalidate(self, client_id: str = None):
+        with self._guard:
+            if client_id is None:
+                self._tenants.clear()
+            else:
+                self._tenants.pop(client_id, None)
+
+    def stats(self) -> dict:
+        return {"tenants": len(self._tenants), "builds": self.builds, "refreshes": self.refreshes,
+                "configured": self.configured}
@@ -0,0 +1,166 @@
+# File: ingest.py
+# Chunked, batched knowledge-base ingestion: split → hash → embed only changed chunks → bulk upsert
+#
+# Usage:
+#   python ingest.py healthyzone:knowledge.txt therichjoe:docs/faq.md therichjoe:docs/pricing.md
+#   python ingest.py --chunk-size 1200 --overlap 200 --concurrency 4 --drop-legacy healthyzone:knowledge.txt
+# Requires the columns from sql/001_kb_chunks.sql and sql/002_embedding_f32.sql.
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+
+from dotenv import load_dotenv
+
+from kb_index import PAGE_SIZE, encode_embedding
+from openai_pool import OpenAIClientPool
+from supabase_rest import AsyncPostgrest, eq, in_, is_null
+
+EMBED_MODEL = "text-embedding-ada-002"
+
+
+def chunk_text(text: str, chunk_size: int = 1200, overlap: int = 200) -> list:
+    # Packs paragraphs up to chunk_size chars; each chunk starts with the tail of the previous one
+    paras = [p.strip() for p in re.split(r"\n\s*\n", text.replace("\ufeff", "")) if p.strip()]
+    pieces = []
+    for p in paras:
+        while len(p) > chunk_size:
+            cut = p.rfind(" ", 0, chunk_size)
+            cut = cut if cut > chunk_size // 2 else chunk_size
+            pieces.append(p[:cut].strip())
+            p = p[cut:].strip()
+        pieces.append(p)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            if tail and " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail}\n\n{piece}" if tail else piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def content_hash(source: str, content: str) -> str:
+    return hashlib.sha256(f"{source}\x00{content}".encode("utf-8")).hexdigest()
+
+
+async def embed_batches(oa, texts: list, batch_size: int, sem: asyncio.Semaphore) -> list:
+    async def one(batch):
+        async with sem:
+            res = await oa.embeddings.create(model=EMBED_MODEL, input=batch)
+            return [d.embedding for d in sorted(res.data, key=lambda d: d.index)]
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(one(b) for b in batches))
+    return [e for batch in results for e in batch]
+
+
+async def list_existing(rest: AsyncPostgrest, table: str, client_id: str, source: str) -> list:
+    # PostgREST returns at most PAGE_SIZE rows per select, so page through a large source
+    rows, start = [], 0
+    while True:
+        page = await rest.select(table, "id,content_hash", {"client_id": eq(client_id), "source": eq(source)},
+                                 order="id.asc", limit=PAGE_SIZE, offset=start)
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+async def ingest_source(rest: AsyncPostgrest, pool: OpenAIClientPool, table: str, client_id: str, path: str,
+                        args, sem: asyncio.Semaphore) -> dict:
+    source = os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        chunks = chunk_text(f.read(), args.chunk_size, args.overlap)
+    wanted = {content_hash(source, c): (i, c) for i, c in enumerate(chunks)}
+
+    existing = await list_existing(rest, table, client_id, source)
+    have = {r["content_hash"]: r["id"] for r in existing if r.get("content_hash")}
+    stale_ids = [r["id"] for r in existing if r.get("content_hash") not in wanted]
+    todo = [(h, i, c) for h, (i, c) in wanted.items() if h not in have]
+
+    stats = {"client_id": client_id, "source": source, "chunks": len(chunks),
+             "embedded": len(todo), "unchanged": len(wanted) - len(todo), "deleted": len(stale_ids)}
+    if args.dry_run:
+        return stats
+
+    if todo:
+        vectors = await embed_batches(pool.get(client_id), [c for _, _, c in todo], args.batch_size, sem)
+        rows = [{
+            "client_id": client_id,
+            "token": client_id,
+            "source": source,
+            "chunk_index": i,
+            "content": c,
+            "content_hash": h,
+            "embedding": v,
+            "embedding_f32": encode_embedding(v),
+        } for (h, i, c), v in zip(todo, vectors)]
+        for k in range(0, len(rows), args.upsert_size):
+            await rest.upsert(table, rows[k:k + args.upsert_size], on_conflict="client_id,content_hash")
+    # Delete only after the replacements are in, so retrieval never sees a gap
+    for k in range(0, len(stale_ids), 200):
+        await rest.delete(table, {"client_id": eq(client_id), "id": in_(stale_ids[k:k + 200])})
+    return stats
+
+
+async def run(targets: list, args) -> list:
+    load_dotenv()
+    table = os.getenv("SUPABASE_TABLE_NAME_KB") or "client_knowledge_base"
+    rest = AsyncPostgrest(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    pool = OpenAIClientPool()
+    sem = asyncio.Semaphore(args.concurrency)
+    try:
+        results = await asyncio.gather(*(
+            ingest_source(rest, pool, table, cid, path, args, sem) for cid, path in targets
+        ))
+        if args.drop_legacy and not args.dry_run:
+            # Rows from the old single-vector upload.py have no content_hash
+            for client_id in sorted({cid for cid, _ in targets}):
+                await rest.delete(table, {"client_id": eq(client_id), "content_hash": is_null()})
+        return results
+    finally:
+        await rest.aclose()
+        await pool.aclose()
+
+
+def parse_targets(specs: list) -> list:
+    targets = []
+    for spec in specs:
+        client_id, sep, path = spec.partition(":")
+        if not sep or not client_id or not path:
+            raise SystemExit(f"❌ Expected client_id:path, got '{spec}'")
+        targets.append((client_id.strip(), path.strip()))
+    return targets
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Chunk, embed and upsert knowledge files per client.")
+    ap.add_argument("targets", nargs="+", help="client_id:path pairs")
+    ap.add_argument("--chunk-size", type=int, default=1200, help="max characters per chunk")
+    ap.add_argument("--overlap", type=int, default=200, help="characters carried into the next chunk")
+    ap.add_argument("--batch-size", type=int, default=64, help="inputs per embeddings request")
+    ap.add_argument("--concurrency", type=int, default=4, help="embeddings requests in flight")
+    ap.add_argument("--upsert-size", type=int, default=100, help="rows per bulk upsert")
+    ap.add_argument("--drop-legacy", action="store_true", help="delete pre-chunking rows for these clients")
+    ap.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = ap.parse_args(argv)
+
+    results = asyncio.run(run(parse_targets(args.targets), args))
+    for r in results:
+        print(f"✅ {r['client_id']}/{r['source']}: {r['chunks']} chunks, "
+              f"{r['embedded']} embedded, {r['unchanged']} unchanged, {r['deleted']} deleted")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,95 @@
+# File: intents.py
+# Intent routing for chat turns: phrase lists compiled once into regex alternations, per-client overrides cached
+
+import collections
+import json
+import re
+import threading
+
+DEFAULT_PHRASES = {
+    "cancel": [
+        "start over",
+        "booking cancelled",
+        "cancel",
+        "i am not booking now",
+        "no",
+        "never mind",
+        "forget it",
+        "stop",
+        "don't want",
+        "not now",
+        "exit",
+        "nope",
+        "quit",
+        "back",
+        "don’t want",
+        "book later",
+        "maybe another time",
+        "some other time",
+        "not booking",
+        "not booking now",
+        "not booking anymore",
+        "don’t want to book",
+        "i don't want to book anymore",
+        "i’m not booking",
+        "will book later"
+    ],
+    "booking": ["book", "booking", "appointment", "meeting", "schedule", "continue", "confirm", "cancel"],
+    "greeting": ["hi", "hello", "hey", "howdy", "good morning", "good afternoon", "good evening"],
+}
+
+Intent = collections.namedtuple("Intent", "cancel cancel_only booking greeting greeting_only")
+
+_TRAILING = " \t\r\n.!?,;:)🙂😊👋"
+
+
+def _alternation(phrases: list) -> str:
+    # Longest first so "not booking now" wins over "not booking"; spaces match any run of whitespace
+    ordered = sorted({p.strip().lower() for p in phrases if p and p.strip()}, key=len, reverse=True)
+    return "|".join(re.escape(p).replace(r"\ ", r"\s+") for p in ordered) or r"(?!)"
+
+
+class IntentRouter:
+    # cancel/booking match anywhere in the text (substring semantics, as before); greetings match whole words
+    def __init__(self, phrases: dict = None):
+        phrases = {**DEFAULT_PHRASES, **(phrases or {})}
+        self._cancel = re.compile(_alternation(phrases["cancel"]))
+        self._booking = re.compile(_alternation(phrases["booking"]))
+        greet = _alternation(phrases["greeting"])
+        self._greeting = re.compile(rf"\b(?:{greet})\b", re.I)
+        self._greeting_only = re.compile(rf"(?:{greet})(?:\s+there)?", re.I)
+
+    def route(self, text: str) -> Intent:
+        t = text.strip().lower()
+        bare = t.rstrip(_TRAILING)
+        return Intent(
+            cancel=bool(self._cancel.search(t)),
+            cancel_only=bool(self._cancel.fullmatch(bare)),
+            booking=bool(self._booking.search(t)),
+            greeting=bool(self._greeting.search(t)),
+            greeting_only=bool(self._greeting_only.fullmatch(bare)),
+        )
+
+
+class IntentRouters:
+    # Clients can replace any phrase list with config "intents": {"cancel": [...], "booking": [...], "greeting": [...]}
+    def __init__(self, max_routers: int = 256):
+        self.default = IntentRouter()
+        self.max_routers = max_routers
+        self._routers = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_config(self, cfg: dict) -> IntentRouter:
+        overrides = (cfg or {}).get("intents")
+        if not isinstance(overrides, dict) or not overrides:
+            return self.default
+        overrides = {k: v for k, v in overrides.items() if k in DEFAULT_PHRASES and isinstance(v, list)}
+        key = json.dumps(overrides, sort_keys=True)
+        with self._lock:
+            router = self._routers.get(key)
+            if router is None:
+                router = self._routers[key] = IntentRouter(overrides)
+                while len(self._routers) > self.max_routers:
+                    self._routers.popitem(last=False)
+            self._routers.move_to_end(key)
+        return router
@@ -0,0 +1,321 @@
+# File: kb_index.py
+# KB similarity search backends sharing one interface:
+#   await backend.prepare(client_id)            → warm/refresh anything that doesn't need the query
+#   await backend.search(client_id, q_emb, k)   → [(content, score), ...] best first
+# "local"  = per-client in-memory vector index over client_knowledge_base rows (KBIndexRegistry)
+# "rpc"    = pgvector top-k inside Postgres via the match_documents RPC (sql/003_match_documents.sql)
+# "sqlite" = offline stand-in with the same scoring, for tests and local runs
+
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from supabase_rest import SupabaseError, eq, in_
+
+PAGE_SIZE  = 1000   # PostgREST caps a single select at 1000 rows by default
+FETCH_SIZE = 200    # ids per `in_` filter when loading new rows
+RETRY_BASE = 2.0    # seconds before the first retry after a failed refresh; doubles up to refresh_seconds
+
+
+def missing_column(e: Exception) -> bool:
+    # Postgres undefined_column (42703) or PostgREST's schema-cache miss (PGRST204): the migration hasn't run
+    return isinstance(e, SupabaseError) and 400 <= e.status_code < 500 and \
+        ("42703" in e.text or "PGRST204" in e.text)
+
+
+def encode_embedding(vec) -> str:
+    # Wire/storage format for the embedding_f32 column: base64 of little-endian float32
+    return base64.b64encode(np.asarray(vec, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_embedding(b64: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(b64), dtype="<f4")
+
+
+def parse_embedding(raw) -> np.ndarray:
+    # Legacy format: pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    return np.asarray(raw, dtype=np.float32)
+
+
+def row_embedding(row: dict) -> np.ndarray:
+    if row.get("embedding_f32"):
+        return decode_embedding(row["embedding_f32"])
+    return parse_embedding(row["embedding"])
+
+
+def normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+class KBIndex:
+    def __init__(self):
+        self.ids: list = []
+        self.hashes: list = []  # content_hash per row (None if unknown); a change means the row was edited
+        self.contents: list = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)  # rows L2-normalized once at load
+        self.checked_at = 0.0
+        self.stale = False     # set by invalidate(): next refresh reloads every row
+        self.failures = 0      # consecutive failed refreshes
+        self.version = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, q_emb, k: int = 1) -> list:
+        if not self.ids:
+            return []
+        q = np.asarray(q_emb, dtype=np.float32)
+        n = np.linalg.norm(q)
+        if n == 0 or q.shape[0] != self.matrix.shape[1]:
+            return []
+        scores = self.matrix @ (q / n)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.contents[i], float(scores[i])) for i in top]
+
+
+class KBIndexRegistry:
+    def __init__(self, rest, table: str, refresh_seconds: float = 60.0):
+        self.rest = rest  # supabase_rest.AsyncPostgrest
+        self.table = table
+        self.refresh_seconds = refresh_seconds
+        self._indexes = {}
+        self._locks = {}
+        self.binary = True  # flips off if the embedding_f32 column isn't there yet
+        self.hashes = True  # flips off if the content_hash column isn't there yet
+
+    def _lock_for(self, client_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(client_id, asyncio.Lock())
+
+    def _due(self, idx: KBIndex) -> bool:
+        if idx is None or idx.stale:
+            return True
+        wait = self.refresh_seconds
+        if idx.failures:
+            wait = min(RETRY_BASE * 2 ** (idx.failures - 1), self.refresh_seconds)
+        return time.time() - idx.checked_at >= wait
+
+    async def get(self, client_id: str) -> KBIndex:
+        idx = self._indexes.get(client_id)
+        if not self._due(idx):
+            return idx
+        async with self._lock_for(client_id):
+            idx = self._indexes.get(client_id)
+            if self._due(idx):
+                try:
+                    idx = await self._refresh(client_id, idx or KBIndex())
+                except Exception as e:
+                    if idx is None:
+                        raise  # nothing loaded yet to fall back on
+                    # Keep answering from what's loaded; back off before asking Supabase again
+                    idx.failures += 1
+                    idx.checked_at = time.time()
+                    print(f"⚠️ KB refresh failed for {client_id} ({idx.failures}x), serving the loaded index: {e}")
+                    return idx
+                self._indexes[client_id] = idx
+        return idx
+
+    async def prepare(self, client_id: str):
+        await self.get(client_id)
+
+    async def search(self, client_id: str, q_emb, k: int = 1) -> list:
+        return (await self.get(client_id)).search(q_emb, k)
+
+    def kb_version(self, client_id: str) -> int:
+        idx = self._indexes.get(client_id)
+        return idx.version if idx is not None else 0
+
+    def invalidate(self, client_id: str = None):
+        # Forces a full reload on next access (the old index keeps serving until it's built), which also
+        # picks up edits the periodic refresh can't see, e.g. a re-embedded row with unchanged content
+        targets = [client_id] if client_id else list(self._indexes)
+        for cid in targets:
+            idx = self._indexes.get(cid)
+            if idx is not None:
+                idx.stale = True
+
+    async def _list_ids(self, client_id: str) -> list:
+        # → [(id, content_hash or None)] for every row of the client
+        columns = "id,content_hash" if self.hashes else "id"
+        rows, start = [], 0
+        while True:
+            try:
+                page = await self.rest.select(self.table, columns, {"client_id": eq(client_id)},
+                                              order="id.asc", limit=PAGE_SIZE, offset=start)
+            except SupabaseError as e:
+                if not self.hashes or not missing_column(e):
+                    raise
+                self.hashes = False
+                return await self._list_ids(client_id)
+            rows.extend((r["id"], r.get("content_hash")) for r in page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            start += PAGE_SIZE
+
+    async def _select_batches(self, client_id: str, ids: list, columns: str) -> list:
+        batches = [ids[i:i + FETCH_SIZE] for i in range(0, len(ids), FETCH_SIZE)]
+        pages = await asyncio.gather(*(
+            self.rest.select(self.table, columns, {"client_id": eq(client_id), "id": in_(batch)})
+            for batch in batches
+        ))
+        return [r for page in pages for r in page]
+
+    async def _fetch_rows(self, client_id: str, ids: list) -> list:
+        if self.binary:
+            try:
+                rows = await self._select_batches(client_id, ids, "id,content,embedding_f32")
+            except SupabaseError as e:
+                if not missing_column(e):
+                    raise  # outage or timeout: keep the binary path and let the next refresh retry it
+                self.binary = False
+            else:
+                # Rows not migrated yet still need the text vector
+                legacy = [r["id"] for r in rows if not r.get("embedding_f32")]
+                if legacy:
+                    text = {r["id"]: r["embedding"] for r in
+                            await self._select_batches(client_id, legacy, "id,embedding")}
+                    for r in rows:
+                        if not r.get("embedding_f32"):
+                            r["embedding"] = text.get(r["id"])
+                return rows
+        return await self._select_batches(client_id, ids, "id,content,embedding")
+
+    async def _refresh(self, client_id: str, old: KBIndex) -> KBIndex:
+        # Only rows that appeared or whose content_hash changed are fetched, vanished ids are dropped,
+        # everything else keeps its parsed vector. A stale index (invalidate()) refetches every row.
+        current = dict(await self._list_ids(client_id))
+        known = {} if old.stale else dict(zip(old.ids, old.hashes))
+        new_ids = [i for i, h in current.items() if i not in known or known[i] != h]
+        if not old.stale and not new_ids and len(current) == len(known):
+            old.checked_at = time.time()
+            old.failures = 0
+            return old
+
+        refetch = set(new_ids)
+        keep = [j for j, i in enumerate(old.ids) if i in known and i in current and i not in refetch]
+        ids = [old.ids[j] for j in keep]
+        hashes = [old.hashes[j] for j in keep]
+        contents = [old.contents[j] for j in keep]
+        vectors = [old.matrix[keep]] if keep else []
+
+        fresh_ids, fresh_hashes, fresh_contents, fresh_vecs = [], [], [], []
+        for r in await self._fetch_rows(client_id, new_ids):
+            try:
+                emb = row_embedding(r)
+            except Exception:
+                continue
+            if vectors and emb.shape[0] != vectors[0].shape[1]:
+                continue
+            if fresh_vecs and emb.shape[0] != fresh_vecs[0].shape[0]:
+                continue
+            fresh_ids.append(r["id"])
+            fresh_hashes.append(current.get(r["id"]))
+            fresh_contents.append(r.get("content") or "")
+            fresh_vecs.append(emb)
+        if fresh_vecs:
+            vectors.append(normalize_rows(np.vstack(fresh_vecs)))
+
+        idx = KBIndex()
+        idx.ids = ids + fresh_ids
+        idx.hashes = hashes + fresh_hashes
+        idx.contents = contents + fresh_contents
+        idx.matrix = (np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+                      if vectors else np.zeros((0, 0), dtype=np.float32))
+        idx.checked_at = time.time()
+        idx.version = old.version + 1
+        return idx
+
+
+class RpcSearchBackend:
+    # Payload per query is k rows no matter how large the KB grows
+    def __init__(self, rest, fn: str = "match_documents"):
+        self.rest = rest
+        self.fn = fn
+        self._generations = {}  # the database can't tell us when rows change; invalidate() bumps these
+
+    async def prepare(self, client_id: str):
+        pass
+
+    async def search(self, client_id: str, q_emb, k: int = 1) -> list:
+        rows = await self.rest.rpc(self.fn, {
+            "query_embedding": np.asarray(q_emb, dtype=np.float32).tolist(),
+            "match_client_id": client_id,
+            "match_count": k,
+        })
+        return [(r.get("content") or "", float(r["similarity"])) for r in rows]
+
+    def kb_version(self, client_id: str) -> int:
+        return self._generations.get(client_id, 0) + self._generations.get(None, 0)
+
+    def invalidate(self, client_id: str = None):
+        self._generations[client_id] = self._generations.get(client_id, 0) + 1
+
+
+class SQLiteSearchBackend:
+    def __init__(self, path: str = ":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kb (id INTEGER PRIMARY KEY, client_id TEXT NOT NULL, "
+            "content TEXT NOT NULL, embedding BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS kb_client ON kb (client_id)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def add(self, client_id: str, content: str, embedding) -> None:
+        vec = np.asarray(embedding, dtype="<f4")
+        with self._lock:
+            self._db.execute("INSERT INTO kb (client_id, content, embedding) VALUES (?, ?, ?)",
+                             (client_id, content, vec.tobytes()))
+            self._db.commit()
+            self.version += 1
+
+    def clear(self, client_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM kb WHERE client_id = ?", (client_id,))
+            self._db.commit()
+            self.version += 1
+
+    async def prepare(self, client_id: str):
+        pass
+
+    async def search(self, client_id: str, q_emb, k: int = 1) -> list:
+        with self._lock:
+            rows = self._db.execute("SELECT content, embedding FROM kb WHERE client_id = ? ORDER BY id",
+                                    (client_id,)).fetchall()
+        if not rows:
+            return []
+        idx = KBIndex()
+        idx.ids = list(range(len(rows)))
+        idx.contents = [r[0] for r in rows]
+        idx.matrix = normalize_rows(np.vstack([np.frombuffer(r[1], dtype="<f4") for r in rows]))
+        return idx.search(q_emb, k)
+
+    def kb_version(self, client_id: str) -> int:
+        return self.version
+
+    def invalidate(self, client_id: str = None):
+        pass
+
+
+def make_search_backend(name: str, rest, table: str, refresh_seconds: float = 60.0,
+                        rpc_fn: str = "match_documents", sqlite_path: str = ":memory:"):
+    name = (name or "local").lower()
+    if name == "rpc":
+        return RpcSearchBackend(rest, rpc_fn)
+    if name == "sqlite":
+        return SQLiteSearchBackend(sqlite_path)
+    if name == "local":
+        return KBIndexRegistry(rest, table, refresh_seconds=refresh_seconds)
+    raise ValueError(f"Unknown KB search backend '{name}'")
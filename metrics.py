@@ -0,0 +1,214 @@
+# File: metrics.py
+# In-process counters and latency histograms rendered in the Prometheus text format, plus stage spans
+
+import contextlib
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+OTHER = "other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, labelnames: tuple = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        key = []
+        for n in self.labelnames:
+            v = labels.get(n, "")
+            key.append(self.registry.client_label(v) if n == "client" else v)
+        return tuple(key)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        return [f"{self.name}_total{_labels(self.labelnames, key)} {value:g}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * len(self.buckets), 0, 0.0]  # per-bucket counts, count, sum
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[0][i] += 1
+                    break
+            s[1] += 1
+            s[2] += value
+
+    def _render_series(self, key, value):
+        counts, count, total = value
+        lines, running = [], 0
+        for bound, n in zip(self.buckets, counts):
+            running += n
+            le = _labels(self.labelnames, key, 'le="%g"' % bound)
+            lines.append(f"{self.name}_bucket{le} {running}")
+        le = _labels(self.labelnames, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{le} {count}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+        return lines
+
+
+class Observed(_Metric):
+    # Values another component already keeps (e.g. a cache's stats()), read at scrape time
+    def __init__(self, registry, name, help, read, labelnames=(), kind="gauge"):
+        super().__init__(registry, name, help, labelnames)
+        self.kind = kind
+        self.read = read  # → number, or {label values: number}
+
+    def render(self) -> list:
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        suffix = "_total" if self.kind == "counter" else ""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Registry:
+    # client_id comes from callers, so its label is capped at max_clients distinct values
+    def __init__(self, max_clients: int = 200):
+        self.max_clients = max_clients
+        self._metrics = []
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def client_label(self, client_id: str) -> str:
+        if not client_id or client_id in self._clients:
+            return client_id or ""
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return OTHER
+            self._clients.add(client_id)
+        return client_id
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        m = Counter(self, name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def observed(self, name: str, help: str, read, labelnames: tuple = (), kind: str = "gauge") -> Observed:
+        m = Observed(self, name, help, read, labelnames, kind)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+request_seconds = registry.histogram("http_request_duration_seconds", "Request latency by route template and client",
+                                     ("route", "method", "status", "client"))
+stage_seconds = registry.histogram("stage_duration_seconds", "Latency of one pipeline stage",
+                                   ("stage", "client"))
+stage_errors = registry.counter("stage_errors", "Stage failures by exception type", ("stage", "client", "error"))
+openai_tokens = registry.counter("openai_tokens", "OpenAI tokens reported in response usage",
+                                 ("client", "model", "kind"))
+
+
+@contextlib.contextmanager
+def span(stage: str, client_id: str = ""):
+    # Works around sync code and around awaits alike; failures are counted, then re-raised
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage_errors.inc(stage=stage, client=client_id, error=type(e).__name__)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage, client=client_id)
+
+
+async def timed(stage: str, client_id: str, awaitable):
+    with span(stage, client_id):
+        return await awaitable
+
+
+def record_usage(client_id: str, model: str, usage):
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, kind, None)
+        if n:
+            openai_tokens.inc(n, client=client_id, model=model, kind=kind[:-len("_tokens")])
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streamed responses are timed until their last chunk; the route label is the
+    # matched path template (bounded), and the client comes from path params or request.state.client_id
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            client = (scope.get("path_params") or {}).get("client_id") or (scope.get("state") or {}).get("client_id", "")
+            request_seconds.observe(time.perf_counter() - started, route=route, method=scope.get("method", ""),
+                                    status=str(status[0]), client=client)
@@ -0,0 +1,50 @@
+# File: migrate_embeddings.py
+# One-time backfill of embedding_f32 for rows written before the binary format (run after sql/002_embedding_f32.sql)
+#
+# Usage:
+#   python migrate_embeddings.py              # all clients
+#   python migrate_embeddings.py healthyzone  # only these clients
+
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from kb_index import encode_embedding, parse_embedding
+from supabase_rest import AsyncPostgrest, eq, is_null
+
+PAGE_SIZE = 200
+
+
+async def migrate(client_ids: list, concurrency: int = 8) -> int:
+    load_dotenv()
+    table = os.getenv("SUPABASE_TABLE_NAME_KB") or "client_knowledge_base"
+    rest = AsyncPostgrest(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    sem = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def convert(row):
+        async with sem:
+            await rest.update(table, {"id": eq(row["id"])},
+                              {"embedding_f32": encode_embedding(parse_embedding(row["embedding"]))})
+
+    try:
+        filters = {"embedding_f32": is_null(), "embedding": "not.is.null"}
+        if client_ids:
+            filters["client_id"] = "in.(" + ",".join(client_ids) + ")"
+        while True:
+            # Converted rows drop out of the filter, so always read the first page
+            rows = await rest.select(table, "id,embedding", filters, order="id.asc", limit=PAGE_SIZE)
+            if not rows:
+                return done
+            await asyncio.gather(*(convert(r) for r in rows))
+            done += len(rows)
+            print(f"… {done} rows converted")
+    finally:
+        await rest.aclose()
+
+
+if __name__ == "__main__":
+    total = asyncio.run(migrate(sys.argv[1:]))
+    print(f"✅ Migration complete: {total} rows now have embedding_f32")
@@ -0,0 +1,86 @@
+# File: openai_pool.py
+# Long-lived AsyncOpenAI clients per tenant sharing one keep-alive connection pool
+
+import collections
+import os
+
+import httpx
+
+
+def key_env_name(client_id: str) -> str:
+    return f"OPENAI_API_KEY_{client_id.replace('-', '_').upper()}"
+
+
+class OpenAIClientPool:
+    def __init__(self, max_connections: int = 50, max_keepalive: int = 20,
+                 keepalive_expiry: float = 60.0, timeout: float = 30.0, max_retries: int = 2,
+                 max_clients: int = 1000):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_clients = max_clients
+        self._http = None
+        self._clients = collections.OrderedDict()  # client_id -> (api_key, AsyncOpenAI), least recently used first
+        self.builds = 0
+        self.reuses = 0
+        self.requests = 0
+        self.tcp_connects = 0
+        self.tls_handshakes = 0
+
+    async def _trace(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self.tcp_connects += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    async def _on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # One pool for every tenant: API keys travel per request, sockets don't care
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(limits=self.limits, timeout=self.timeout,
+                                           event_hooks={"request": [self._on_request]})
+            self._clients.clear()
+        return self._http
+
+    def get(self, client_id: str):
+        from openai import AsyncOpenAI  # heavy (~0.5 s); loaded by the first request or the warm-up, not at import
+
+        key = os.getenv(key_env_name(client_id)) or os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError(f"No OpenAI key for client '{client_id}'")
+        http = self.http
+        cached = self._clients.get(client_id)
+        if cached is not None and cached[0] == key:
+            self.reuses += 1
+            self._clients.move_to_end(client_id)
+            return cached[1]
+        client = AsyncOpenAI(api_key=key, http_client=http, max_retries=self.max_retries)
+        self._clients[client_id] = (key, client)
+        self._clients.move_to_end(client_id)
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)  # the shared http pool stays open; nothing to close
+        self.builds += 1
+        return client
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "builds": self.builds,
+            "reuses": self.reuses,
+            "requests": self.requests,
+            "tcp_connects": self.tcp_connects,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": max(self.requests - self.tcp_connects, 0),
+        }
@@ -0,0 +1,166 @@
+# File: prompt_budget.py
+# Token-budgeted prompt assembly: local token counts, top-k KB chunks with overlap removed, newest-first history
+
+import functools
+import re
+import threading
+
+try:
+    import tiktoken  # exact counts when it imports and its BPE file loads; otherwise a slightly pessimistic estimate
+except ImportError:
+    tiktoken = None
+
+MESSAGE_OVERHEAD = 8     # role/separator tokens the chat format adds around a single user message
+MIN_CHUNK_TOKENS = 48    # a chunk cut shorter than this is more noise than context
+MIN_OVERLAP_CHARS = 40   # shorter shared edges are coincidence, not ingest overlap
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+_encodings = {}  # model -> tiktoken Encoding, or None if it couldn't be loaded
+_loading = set()
+_loading_lock = threading.Lock()
+
+
+def load_encoding(model: str) -> bool:
+    # Blocking: the first load downloads the BPE file (disk-cached afterwards). The warm-up runs this off the
+    # event loop; any failure (no network, bad cache dir, ...) leaves the estimator in charge.
+    if model not in _encodings:
+        enc = None
+        if tiktoken is not None:
+            try:
+                try:
+                    enc = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    enc = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"⚠️ tiktoken encoding for {model} unavailable, estimating token counts: {e}")
+        _encodings[model] = enc
+    return _encodings[model] is not None
+
+
+def _encoding(model: str):
+    # Never loads on the request path: until load_encoding() has finished, counts are estimated
+    # and the load is started in the background
+    if model in _encodings:
+        return _encodings[model]
+    if tiktoken is not None:
+        with _loading_lock:
+            if model not in _loading:
+                _loading.add(model)
+                threading.Thread(target=load_encoding, args=(model,), daemon=True).start()
+    return None
+
+
+def _estimate(text: str) -> int:
+    # BPE vocabularies give common words one token and split long/rare ones roughly every 4 chars
+    return sum(1 + (len(p) - 1) // 4 for p in _PIECE.findall(text))
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    if not text:
+        return 0
+    return _count(text, model, _encoding(model) is not None)
+
+
+@functools.lru_cache(maxsize=4096)
+def _count(text: str, model: str, exact: bool) -> int:
+    # KB chunks repeat across questions, so their counts are memoized; estimates are keyed apart from exact counts
+    if exact:
+        return len(_encodings[model].encode(text, disallowed_special=()))
+    return _estimate(text)
+
+
+def truncate_tokens(text: str, limit: int, model: str = "gpt-3.5-turbo") -> str:
+    # Keeps the head of text within limit tokens
+    if limit <= 0:
+        return ""
+    if count_tokens(text, model) <= limit:
+        return text
+    enc = _encoding(model)
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:limit]).rstrip()
+    used, end = 0, 0
+    for m in _PIECE.finditer(text):
+        used += 1 + (len(m.group()) - 1) // 4
+        if used > limit:
+            break
+        end = m.end()
+    return text[:end].rstrip()
+
+
+def _overlap(a: str, b: str) -> int:
+    # Length of the longest suffix of a that is also a prefix of b (at least MIN_OVERLAP_CHARS), else 0
+    if len(a) < MIN_OVERLAP_CHARS or len(b) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = b[:MIN_OVERLAP_CHARS]
+    start = max(0, len(a) - len(b))
+    i = a.find(probe, start)
+    while i != -1:
+        if b.startswith(a[i:]):
+            return len(a) - i  # earliest match is the longest overlap
+        i = a.find(probe, i + 1)
+    return 0
+
+
+def dedupe_chunks(chunks: list) -> list:
+    # Neighbouring ingest chunks share their edges; drop repeats and cut the shared text from later chunks
+    kept = []
+    for text in chunks:
+        text = (text or "").strip()
+        if not text or any(text in k for k in kept):
+            continue
+        for k in kept:
+            head = _overlap(k, text)
+            if head:
+                text = text[head:].lstrip()
+            tail = _overlap(text, k)
+            if tail:
+                text = text[:-tail].rstrip()
+        if text:
+            kept.append(text)
+    return kept
+
+
+def kb_prompt(bot_name: str, chunks: list, question: str, budget: int, model: str = "gpt-3.5-turbo") -> str:
+    # Chunks arrive best-first; each one that fits goes in whole, the first that doesn't is cut to what's left
+    head = f"You are {bot_name}. Answer using ONLY this knowledge:\n\n"
+    question = truncate_tokens(question, max(budget // 4, 1), model)
+    tail = f"\n\nQ: {question}\nA:"
+    left = budget - MESSAGE_OVERHEAD - count_tokens(head, model) - count_tokens(tail, model)
+    parts = []
+    for text in dedupe_chunks(chunks):
+        cost = count_tokens(text, model) + 2
+        if cost <= left:
+            parts.append(text)
+            left -= cost
+            continue
+        if left >= MIN_CHUNK_TOKENS or not parts:
+            parts.append(truncate_tokens(text, left - 2, model))
+        break
+    return head + "\n\n".join(p for p in parts if p) + tail
+
+
+def history_prompt(booking_note: str, summary: str, history: list, question: str, budget: int,
+                   max_turns: int = 5, model: str = "gpt-3.5-turbo") -> str:
+    # Booking note and question always go in; the summary gets up to a quarter of the budget;
+    # then the most recent turns are added newest-first until the budget runs out
+    question = truncate_tokens(question, max(budget // 4, 1), model)
+    tail = f"User: {question}\nBot:"
+    left = budget - MESSAGE_OVERHEAD - count_tokens(booking_note, model) - count_tokens(tail, model)
+    prompt = booking_note  # <<-- Always at the top of the prompt!
+    if summary:
+        summary = truncate_tokens(summary, left // 4, model)
+        line = f"Earlier in this conversation: {summary}\n"
+        if summary and count_tokens(line, model) < left:
+            prompt += line
+            left -= count_tokens(line, model)
+    turns = []
+    for turn in reversed(history[-max_turns:] if max_turns else []):
+        text = f"User: {turn.get('user', '')}\nBot: {turn.get('bot', '')}\n"
+        cost = count_tokens(text, model)
+        if cost > left:
+            break
+        turns.append(text)
+        left -= cost
+    return prompt + "".join(reversed(turns)) + tail
@@ -0,0 +1,186 @@
+# File: rate_limit.py
+# Token-bucket rate limiting: bounded in-memory buckets per process, or SQLite buckets shared by all workers
+
+import asyncio
+import collections
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+class Limit:
+    # "30/60" → 30 requests per 60 seconds, refilled continuously; bursts up to the full 30
+    __slots__ = ("requests", "period")
+
+    def __init__(self, requests: int, period: float):
+        self.requests = requests
+        self.period = period
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        n, _, secs = spec.strip().partition("/")
+        return cls(int(n), float(secs or 60))
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.period
+
+    def __repr__(self):
+        return f"Limit({self.requests}/{self.period:g})"
+
+
+def parse_limits(spec: str) -> dict:
+    # "*=30/60,book=5/60" → {"*": Limit(30/60), "book": Limit(5/60)}
+    limits = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            route, _, value = part.partition("=")
+            limits[route.strip()] = Limit.parse(value)
+    return limits
+
+
+def _take(tokens: float, updated: float, now: float, limit: Limit):
+    # → (allowed, tokens left, retry_after seconds)
+    tokens = min(float(limit.requests), tokens + (now - updated) * limit.rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / limit.rate
+
+
+class MemoryRateLimiter:
+    # Idle buckets refill to full, which is the same as having no bucket, so evicting the
+    # least recently used key once max_keys is reached never lets anyone exceed a limit
+    blocking = False  # microseconds under a thread lock; fine to call on the event loop
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key: str, limit: Limit):
+        now = time.time()
+        with self._lock:
+            state = self._buckets.get(key)
+            tokens, updated = state if state else (float(limit.requests), now)
+            allowed, tokens, retry_after = _take(tokens, updated, now, limit)
+            self._buckets[key] = [tokens, now]
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": len(self._buckets), "evictions": self.evictions}
+
+
+class SQLiteRateLimiter:
+    # One row per bucket; BEGIN IMMEDIATE serializes the read-modify-write across processes
+    blocking = True  # may wait up to the 5 s busy timeout for another worker's write lock
+
+    def __init__(self, path: str, purge_every: int = 1000, idle_seconds: float = 3600):
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rate_buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._lock = threading.Lock()
+        self.purge_every = purge_every
+        self.idle_seconds = idle_seconds
+        self._calls = 0
+
+    def hit(self, key: str, limit: Limit):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (float(limit.requests), now)
+                allowed, tokens, retry_after = _take(tokens, updated, now, limit)
+                self._db.execute("INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                                 "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                                 (key, tokens, now))
+                self._calls += 1
+                if self._calls % self.purge_every == 0:
+                    self._db.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.idle_seconds,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = self._db.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        return {"backend": "sqlite", "keys": keys}
+
+
+def limits_env_name(client_id: str) -> str:
+    return f"RATE_LIMITS_{client_id.upper().replace('-', '_')}"
+
+
+class RateLimits:
+    # Per-route limits with per-client overrides from RATE_LIMITS_<CLIENT>; lookup order is
+    # client route → client "*" → route → "*" → default.
+    # client_id is whatever the caller sent, so every request also spends from one bucket per caller
+    # (per_caller, across routes and clients): inventing a new client_id per request can't get past that.
+    def __init__(self, limiter, default: Limit, routes: dict = None, per_caller: Limit = None):
+        self.limiter = limiter
+        self.default = default
+        self.routes = routes or {}
+        self.per_caller = per_caller
+        self._clients = {}  # client_id -> (raw env value, {route: Limit}), only for clients with overrides
+        self.rejected = 0
+
+    def _client_limits(self, client_id: str) -> dict:
+        if not client_id:
+            return {}
+        raw = os.getenv(limits_env_name(client_id), "")
+        if not raw:
+            self._clients.pop(client_id, None)  # bounded by the env, not by what callers send
+            return {}
+        cached = self._clients.get(client_id)
+        if cached is None or cached[0] != raw:
+            cached = (raw, parse_limits(raw))
+            self._clients[client_id] = cached
+        return cached[1]
+
+    def limit_for(self, route: str, client_id: str = "") -> Limit:
+        own = self._client_limits(client_id)
+        return own.get(route) or own.get("*") or self.routes.get(route) or self.routes.get("*") or self.default
+
+    def check(self, route: str, client_id: str, caller: str):
+        # → None when allowed, else whole seconds the caller should wait (for Retry-After)
+        if self.per_caller is not None:
+            allowed, retry_after = self.limiter.hit(f"*:{caller}", self.per_caller)
+            if not allowed:
+                self.rejected += 1
+                return max(1, math.ceil(retry_after))
+        allowed, retry_after = self.limiter.hit(f"{route}:{client_id}:{caller}", self.limit_for(route, client_id))
+        if allowed:
+            return None
+        self.rejected += 1
+        return max(1, math.ceil(retry_after))
+
+    async def acheck(self, route: str, client_id: str, caller: str):
+        # For async handlers: a backend that can block (SQLite busy timeout) runs in a worker thread
+        if self.limiter.blocking:
+            return await asyncio.to_thread(self.check, route, client_id, caller)
+        return self.check(route, client_id, caller)
+
+    def stats(self) -> dict:
+        return {**self.limiter.stats(), "rejected": self.rejected}
+
+
+def make_rate_limiter(name: str, path: str = None, max_keys: int = 10000):
+    name = (name or "memory").lower()
+    if name == "memory":
+        return MemoryRateLimiter(max_keys=max_keys)
+    if name == "sqlite":
+        if not path:
+            raise ValueError("RATE_LIMIT_SQLITE_PATH is required for the sqlite rate limiter")
+        return SQLiteRateLimiter(path)
+    raise ValueError(f"Unknown rate limit backend '{name}'")
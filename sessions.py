@@ -0,0 +1,124 @@
+# File: sessions.py
+# Server-side chat sessions (recent turns, rolling summary, booking state): memory LRU/TTL or shared SQLite
+
+import collections
+import json
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+
+
+class Session:
+    __slots__ = ("id", "client_id", "turns", "summary", "booking", "updated_at")
+
+    def __init__(self, id: str, client_id: str, turns: list = None, summary: str = "", booking: dict = None,
+                 updated_at: float = None):
+        self.id = id
+        self.client_id = client_id
+        self.turns = turns or []  # [{"user": ..., "bot": ...}], oldest first, only what isn't summarized yet
+        self.summary = summary
+        self.booking = booking or {}
+        self.updated_at = updated_at or time.time()
+
+    @classmethod
+    def new(cls, client_id: str, turns: list = None, booking: dict = None) -> "Session":
+        return cls(uuid4().hex, client_id, list(turns or []), "", booking)
+
+    def to_json(self) -> str:
+        return json.dumps({"client_id": self.client_id, "turns": self.turns, "summary": self.summary,
+                           "booking": self.booking})
+
+    @classmethod
+    def from_json(cls, id: str, data: str, updated_at: float) -> "Session":
+        d = json.loads(data)
+        return cls(id, d["client_id"], d.get("turns"), d.get("summary", ""), d.get("booking"), updated_at)
+
+
+class MemorySessionStore:
+    def __init__(self, max_sessions: int = 10000, ttl: float = 86400):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is None:
+                return None
+            if time.time() - s.updated_at > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return s
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._sessions)}
+
+
+class SQLiteSessionStore:
+    # Shared by every worker on the host, and survives restarts
+    def __init__(self, path: str, ttl: float = 86400, purge_every: int = 500):
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chat_sessions "
+                         "(id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._saves = 0
+
+    def get(self, session_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT data, updated FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return Session.from_json(session_id, row[0], row[1])
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        with self._lock:
+            self._db.execute("INSERT INTO chat_sessions (id, data, updated) VALUES (?, ?, ?) "
+                             "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+                             (session.id, session.to_json(), session.updated_at))
+            self._saves += 1
+            if self._saves % self.purge_every == 0:
+                self._db.execute("DELETE FROM chat_sessions WHERE updated < ?", (time.time() - self.ttl,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self._db.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+        return {"backend": "sqlite", "sessions": n}
+
+
+def make_session_store(name: str, path: str = None, max_sessions: int = 10000, ttl: float = 86400):
+    name = (name or "memory").lower()
+    if name == "memory":
+        return MemorySessionStore(max_sessions=max_sessions, ttl=ttl)
+    if name == "sqlite":
+        if not path:
+            raise ValueError("SESSION_SQLITE_PATH is required for the sqlite session store")
+        return SQLiteSessionStore(path, ttl=ttl)
+    raise ValueError(f"Unknown session backend '{name}'")
+
+
+def summary_prompt(summary: str, turns: list) -> str:
+    text = "".join(f"User: {t.get('user', '')}\nBot: {t.get('bot', '')}\n" for t in turns)
+    return (
+        "Update the running summary of a customer-support chat with the new exchanges below. "
+        "Keep names, contact details, dates, times and open requests; drop pleasantries. "
+        "Reply with the summary only, at most 120 words.\n\n"
+        f"Current summary: {summary or '(none)'}\n\nNew exchanges:\n{text}"
+    )
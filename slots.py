@@ -0,0 +1,143 @@
+# File: slots.py
+# Slot engine: busy intervals parsed once into sorted, merged arrays; free windows found with one sweep
+
+import bisect
+import datetime
+import threading
+import time
+from datetime import timedelta
+
+from dateutil import parser
+
+UTC = datetime.timezone.utc
+
+
+def parse_hhmm(value: str) -> datetime.time:
+    h, m = map(int, value.split(":"))
+    return datetime.time(h, m)
+
+
+class BusyIntervals:
+    def __init__(self, intervals=()):
+        # Merged and sorted, so both starts and ends are monotonic and bisectable
+        merged = []
+        for start, end in sorted((s.astimezone(UTC), e.astimezone(UTC)) for s, e in intervals):
+            if end <= start:
+                continue
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        self.starts = [m[0] for m in merged]
+        self.ends = [m[1] for m in merged]
+
+    @classmethod
+    def from_google(cls, busy: list) -> "BusyIntervals":
+        # Google returns [{"start": iso, "end": iso}, ...] with offsets; compare as datetimes, never strings
+        return cls((parser.isoparse(b["start"]), parser.isoparse(b["end"])) for b in busy)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start: datetime.datetime, end: datetime.datetime) -> bool:
+        i = bisect.bisect_right(self.ends, start.astimezone(UTC))
+        return i < len(self.starts) and self.starts[i] < end.astimezone(UTC)
+
+    def free_windows(self, start: datetime.datetime, end: datetime.datetime,
+                     pad_before: timedelta = timedelta(0), pad_after: timedelta = timedelta(0)) -> list:
+        # A busy block [s, e) blocks meetings in [s - pad_after, e + pad_before)
+        start, end = start.astimezone(UTC), end.astimezone(UTC)
+        i = bisect.bisect_right(self.ends, start - pad_before)
+        free, cursor = [], start
+        while i < len(self.starts) and self.starts[i] - pad_after < end:
+            block_start = self.starts[i] - pad_after
+            if block_start > cursor:
+                free.append((cursor, block_start))
+            cursor = max(cursor, self.ends[i] + pad_before)
+            i += 1
+        if cursor < end:
+            free.append((cursor, end))
+        return free
+
+
+def day_window(day: datetime.date, tz, cfg: dict):
+    hours = cfg.get("availableHours", {}).get(day.strftime("%A").lower())
+    if not hours or len(hours) != 2:
+        return None
+    opens = tz.localize(datetime.datetime.combine(day, parse_hhmm(hours[0])))
+    closes = tz.localize(datetime.datetime.combine(day, parse_hhmm(hours[1])))
+    return (opens, closes) if closes > opens else None
+
+
+def slot_settings(cfg: dict) -> dict:
+    return {
+        "duration": timedelta(minutes=int(cfg.get("meetingDuration", 40))),
+        "step": timedelta(minutes=int(cfg.get("slotStep", 30))),
+        "buffer_before": timedelta(minutes=int(cfg.get("bufferBefore", 0))),
+        "buffer_after": timedelta(minutes=int(cfg.get("bufferAfter", 0))),
+    }
+
+
+def generate_slots(first_day: datetime.date, last_day: datetime.date, tz, cfg: dict, busy: BusyIntervals,
+                   not_before: datetime.datetime = None, limit: int = None) -> dict:
+    # → {date: [aware datetimes in tz]}; slots stay aligned to each day's opening time
+    st = slot_settings(cfg)
+    duration, step = st["duration"], st["step"]
+    out = {}
+    day, found = first_day, 0
+    while day <= last_day:
+        out[day] = []
+        window = day_window(day, tz, cfg)
+        if window:
+            opens = window[0].astimezone(UTC)
+            for free_start, free_end in busy.free_windows(*window, st["buffer_before"], st["buffer_after"]):
+                if not_before is not None:
+                    free_start = max(free_start, not_before.astimezone(UTC))
+                # First step-aligned start inside this free window
+                k = max(0, -(-(free_start - opens) // step))
+                current = opens + k * step
+                while current + duration <= free_end:
+                    out[day].append(current.astimezone(tz))
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return out
+                    current += step
+        day += timedelta(days=1)
+    return out
+
+
+class AvailabilityCache:
+    # Short-lived per-client cache of upstream availability for a day range; any cached range
+    # that covers the requested days answers the request. /book invalidates the client.
+    def __init__(self, ttl: float = 60, max_ranges_per_client: int = 8):
+        self.ttl = ttl
+        self.max_ranges = max_ranges_per_client
+        self._ranges = {}  # client_id -> [(first_day, last_day, stored_at, value)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, client_id: str, first_day: datetime.date, last_day: datetime.date):
+        now = time.time()
+        with self._lock:
+            for lo, hi, stored_at, value in self._ranges.get(client_id, ()):
+                if lo <= first_day and last_day <= hi and now - stored_at < self.ttl:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+        return None
+
+    def put(self, client_id: str, first_day: datetime.date, last_day: datetime.date, value):
+        now = time.time()
+        with self._lock:
+            ranges = [r for r in self._ranges.get(client_id, ()) if now - r[2] < self.ttl]
+            ranges.append((first_day, last_day, now, value))
+            self._ranges[client_id] = ranges[-self.max_ranges:]
+
+    def invalidate(self, client_id: str = None):
+        with self._lock:
+            if client_id is None:
+                self._ranges.clear()
+            else:
+                self._ranges.pop(client_id, None)
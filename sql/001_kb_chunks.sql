@@ -0,0 +1,9 @@
+-- Chunked knowledge base rows written by ingest.py
+-- content_hash = sha256(source || '\0' || content), so re-ingesting only touches changed chunks
+
+alter table client_knowledge_base add column if not exists source       text;
+alter table client_knowledge_base add column if not exists chunk_index  integer;
+alter table client_knowledge_base add column if not exists content_hash text;
+
+create unique index if not exists client_knowledge_base_client_hash_idx
+    on client_knowledge_base (client_id, content_hash);
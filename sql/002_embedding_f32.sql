@@ -0,0 +1,4 @@
+-- Compact embedding copy read by the app: base64 of little-endian float32 (see kb_index.encode_embedding)
+-- `embedding` stays as the source of truth for pgvector; backfill existing rows with migrate_embeddings.py
+
+alter table client_knowledge_base add column if not exists embedding_f32 text;
@@ -0,0 +1,47 @@
+-- Server-side top-k for KB_SEARCH_BACKEND=rpc: only the k best rows and scores cross the wire
+-- Assumes client_knowledge_base.embedding is vector(1536) (text-embedding-ada-002)
+--
+-- The HNSW index is global, so a plain filtered query walks it, drops other clients' neighbours and can return
+-- fewer than match_count rows for a small client. pgvector >= 0.8 iterative scans keep walking until enough rows
+-- pass the client_id filter; on older pgvector the client's rows are ranked exactly instead (the
+-- (client_id, content_hash) index from 001 narrows the scan to one client).
+
+create extension if not exists vector;
+
+create index if not exists client_knowledge_base_embedding_idx
+    on client_knowledge_base using hnsw (embedding vector_cosine_ops);
+
+create or replace function match_documents(
+    query_embedding vector(1536),
+    match_client_id text,
+    match_count     int default 5
+)
+returns table (content text, similarity float)
+language plpgsql stable
+as $$
+#variable_conflict use_column
+begin
+    begin
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);  -- transaction-local
+    exception when others then
+        return query
+            select kb.content, 1 - (kb.embedding <=> query_embedding) as similarity
+            from client_knowledge_base kb
+            where kb.client_id = match_client_id
+            order by (kb.embedding <=> query_embedding) + 0  -- not the indexed expression: exact, no post-filter
+            limit match_count;
+        return;
+    end;
+    -- relaxed_order may return neighbours slightly out of order; re-sort the k rows
+    return query
+        select m.content, 1 - m.distance as similarity
+        from (
+            select kb.content, kb.embedding <=> query_embedding as distance
+            from client_knowledge_base kb
+            where kb.client_id = match_client_id
+            order by kb.embedding <=> query_embedding
+            limit match_count
+        ) m
+        order by m.distance;
+end;
+$$;
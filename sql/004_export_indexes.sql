@@ -0,0 +1,9 @@
+-- Keyset indexes for GET /export/{client_id}/{conversations|ratings}
+-- Each page is "client_id = ? and (ts, id) > (last ts, last id) order by ts, id limit n": one index range scan,
+-- however deep into the tenant's history the export is
+
+create index if not exists client_conversations_export_idx
+    on client_conversations (client_id, "timestamp", id);
+
+create index if not exists chat_ratings_export_idx
+    on chat_ratings (client_id, created_at, id);
@@ -157,6 +157,7 @@ function typewriterTooltip(text, speed = 33) {
     let bookingState  = { inProgress: false, date: null, time: null };
 
 let conversationHistory = []; // NEW: For memory
+let sessionId = null;          // server keeps the turns; we only send this back
 
 function updateConversationHistory(user, bot) {
   conversationHistory.push({ user, bot });
@@ -376,6 +377,23 @@ async function getAvailableSlots(dateStr) {
 }
 
 
+// One /availability range request covers the next two weeks of date picks
+const slotRangeCache = {};
+async function getSlotsForDate(dateStr) {
+  if (!(dateStr in slotRangeCache)) {
+    const end = new Date(`${dateStr}T00:00:00Z`);
+    end.setUTCDate(end.getUTCDate() + 13);
+    const endStr = end.toISOString().split("T")[0];
+    const res = await fetch(`${API_BASE}/availability/${client_id}/range?start=${dateStr}&end=${endStr}&token=${token}`);
+    if (!res.ok) throw new Error("availability");
+    const data = await res.json();
+    Object.assign(slotRangeCache, data.days || {});
+    setTimeout(() => Object.keys(data.days || {}).forEach(d => delete slotRangeCache[d]), 60000);
+  }
+  return slotRangeCache[dateStr] || [];
+}
+
+
 async function showDateTimePicker() {
   return new Promise(async resolve => {
     const wrapper = document.createElement("div");
@@ -395,8 +413,7 @@ async function showDateTimePicker() {
       slotContainer.innerHTML = `<span>Loading available times…</span>`;
 
       try {
-        const res = await fetch(`${API_BASE}/availability/${client_id}?date=${dateStr}&token=${token}`);
-        const data = await res.json();
+        const data = { slots: await getSlotsForDate(dateStr) };
 
         if (!data.slots || data.slots.length === 0) {
           slotContainer.innerHTML = `<span>❌ No available time slots on this date.</span>`;
@@ -1002,6 +1019,45 @@ function stripTags(str) {
 }
 
 
+    // Reads /chat/stream (SSE over fetch) and reports the growing answer; null means "use /chat instead"
+    async function streamAnswer(body, onDelta) {
+      const res = await fetch(`${API_BASE}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body
+      });
+      if (!res.ok || !res.body?.getReader) return null;
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buf = "", answer = "", final = null;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buf += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buf.indexOf("\n\n")) !== -1) {
+          const raw = buf.slice(0, sep);
+          buf = buf.slice(sep + 2);
+          let event = "message", data = "";
+          raw.split("\n").forEach(line => {
+            if (line.startsWith("event:")) event = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          });
+          if (!data) continue;
+          const msg = JSON.parse(data);
+          if (event === "done" || event === "error") {
+            final = msg.answer;
+            if (msg.session_id) sessionId = msg.session_id;
+          }
+          else if (msg.delta) {
+            answer += msg.delta;
+            onDelta(answer);
+          }
+        }
+      }
+      return final ?? (answer || null);
+    }
+
     async function sendMessage(txt) {
       const id = `msg-${Date.now()}`;
       showMessage("", false, true, id);
@@ -1014,25 +1070,47 @@ function stripTags(str) {
       }
 
       try {
-        const res = await fetch(`${API_BASE}/chat`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
+        const body = JSON.stringify({
   question: txt,
   token,
   client_id,
-  history: conversationHistory,    // <-- Already in your memory implementation
+  session_id: sessionId,
+  history: sessionId ? undefined : conversationHistory,  // only seeds a brand-new session
   booking: bookingState           // <-- NEW: Send booking state!
-})
-        });
+});
+        let answer = null, received = "";
+        try {
+          answer = await streamAnswer(body, partial => {
+            received = partial;
+            const el = getEl(id);
+            if (el) el.innerHTML = `${chatbotName}: ${linkify(stripTags(partial))}`;
+            chatBox.scrollTop = chatBox.scrollHeight;
+          });
+        } catch {
+          // Falling back to /chat is only safe before anything arrived: after that it would ask (and bill) again
+          // and replace text the visitor is already reading
+          answer = received ? `${received}\n\n⚠️ The connection dropped before the answer was complete.` : null;
+        }
+        if (answer === null) {
+          const res = await fetch(`${API_BASE}/chat`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body
+          });
+          if (!res.ok) {
+            getEl(`${id}-wrapper`)?.remove();
+            return botReply("⚠️ Server error. Please try again.", false);
+          }
+          const data = await res.json();
+          if (data.session_id) sessionId = data.session_id;
+          answer = data.answer;
+        }
         const wrapper = getEl(`${id}-wrapper`);
         if (wrapper) wrapper.remove();
-        if (!res.ok) return botReply("⚠️ Server error. Please try again.", false);
-        const data = await res.json();
 const safeAnswer =
-  typeof data.answer === "string"
-    ? linkify(stripTags(data.answer))
-    : (data.answer ? JSON.stringify(data.answer, null, 2) : "No response from bot.");
+  typeof answer === "string"
+    ? linkify(stripTags(answer))
+    : (answer ? JSON.stringify(answer, null, 2) : "No response from bot.");
 showMessage(`${chatbotName}: ${safeAnswer}`, false);
 updateConversationHistory(txt, safeAnswer); // log conversation
 replySound?.play();
@@ -0,0 +1,177 @@
+# File: static_assets.py
+# In-memory cache of static/config files keyed by path + mtime: precompressed variants, strong ETags, byte ranges
+
+import collections
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from fastapi import Request, Response
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+MIME_OVERRIDES = {
+    ".js": "application/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".html": "text/html; charset=utf-8",
+    ".wav": "audio/wav",
+    ".svg": "image/svg+xml",
+}
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def content_type(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return MIME_OVERRIDES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+class Asset:
+    __slots__ = ("body", "etag", "media_type", "variants", "stamp")
+
+    def __init__(self, body: bytes, media_type: str, stamp: tuple, min_compress: int):
+        self.body = body
+        self.media_type = media_type
+        self.stamp = stamp  # (mtime_ns, size): any edit on disk yields a new Asset
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {}  # encoding -> bytes, kept only when they actually save space
+        if len(body) >= min_compress and media_type.startswith(COMPRESSIBLE):
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            self.variants = {k: v for k, v in self.variants.items() if len(v) < len(body)}
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    def variant_etag(self, encoding: str) -> str:
+        # Strong ETags identify exact bytes, so each encoding gets its own
+        return self.etag if not encoding else f'{self.etag[:-1]}-{encoding}"'
+
+
+class AssetCache:
+    def __init__(self, root: str, max_bytes: int = 64 * 1024 * 1024, min_compress: int = 1024):
+        self.root = os.path.realpath(root)
+        self.max_bytes = max_bytes
+        self.min_compress = min_compress
+        self._assets = collections.OrderedDict()  # relative path -> Asset
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def _resolve(self, rel: str):
+        fp = os.path.realpath(os.path.join(self.root, rel))
+        # Refuse anything that escapes the root (../, absolute paths, symlinks out)
+        if os.path.commonpath([fp, self.root]) != self.root or not os.path.isfile(fp):
+            return None
+        return fp
+
+    def get(self, rel: str):
+        fp = self._resolve(rel)
+        if fp is None:
+            return None
+        st = os.stat(fp)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            asset = self._assets.get(rel)
+            if asset is not None and asset.stamp == stamp:
+                self._assets.move_to_end(rel)
+                self.hits += 1
+                return asset
+        with open(fp, "rb") as f:
+            asset = Asset(f.read(), content_type(fp), stamp, self.min_compress)
+        with self._lock:
+            old = self._assets.pop(rel, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._assets[rel] = asset
+            self._bytes += asset.size
+            self.loads += 1
+            while self._bytes > self.max_bytes and len(self._assets) > 1:
+                _, evicted = self._assets.popitem(last=False)
+                self._bytes -= evicted.size
+        return asset
+
+    def stats(self) -> dict:
+        return {"assets": len(self._assets), "bytes": self._bytes, "hits": self.hits, "loads": self.loads,
+                "brotli": brotli is not None}
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def _byte_range(header: str, size: int):
+    # Single "bytes=a-b" / "bytes=a-" / "bytes=-n" range → (start, end) inclusive; None = ignore; False = 416
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # multipart ranges aren't worth it here; send the whole file
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start == "":
+            n = int(end)
+            if n <= 0:
+                return False
+            return max(0, size - n), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def asset_response(asset: Asset, request: Request, cache_control: str) -> Response:
+    headers = {
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Access-Control-Allow-Origin": "*",
+    }
+    if asset.variants:
+        headers["Vary"] = "Accept-Encoding"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {t.strip() for t in if_none_match.split(",")}
+        known = {asset.etag, *(asset.variant_etag(e) for e in asset.variants)}
+        if "*" in tags or tags & known:
+            matched = next(iter(tags & known), asset.etag)
+            return Response(status_code=304, headers={**headers, "ETag": matched})
+
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", asset.etag) == asset.etag:
+        rng = _byte_range(range_header, len(asset.body))
+        if rng is False:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(asset.body)}"})
+        if rng is not None:
+            start, end = rng
+            return Response(content=asset.body[start:end + 1], status_code=206, media_type=asset.media_type,
+                            headers={**headers, "ETag": asset.etag,
+                                     "Content-Range": f"bytes {start}-{end}/{len(asset.body)}"})
+
+    accepted = _accepted_encodings(request.headers.get("accept-encoding"))
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and encoding in accepted:
+            return Response(content=asset.variants[encoding], media_type=asset.media_type,
+                            headers={**headers, "ETag": asset.variant_etag(encoding), "Content-Encoding": encoding})
+    return Response(content=asset.body, media_type=asset.media_type, headers={**headers, "ETag": asset.etag})
@@ -0,0 +1,109 @@
+# File: supabase_rest.py
+# Minimal async PostgREST client (httpx) for the hot paths that must not block the event loop
+
+import httpx
+
+
+def eq(value) -> str:
+    return f"eq.{value}"
+
+
+def in_(values) -> str:
+    return "in.(" + ",".join(str(v) for v in values) + ")"
+
+
+def is_null() -> str:
+    return "is.null"
+
+
+def quote(value) -> str:
+    # Values inside and=/or= trees are double-quoted so timestamps (":", ".") and commas parse as data
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def cond(column: str, op: str, value) -> str:
+    # One condition for and_/or_, e.g. cond("timestamp", "gte", "2025-01-01") → timestamp.gte."2025-01-01"
+    return f"{column}.{op}.{quote(value)}"
+
+
+def and_(*conds) -> str:
+    return "and(" + ",".join(conds) + ")"
+
+
+def or_(*conds) -> str:
+    return "or(" + ",".join(conds) + ")"
+
+
+def where(*conds) -> dict:
+    # Top-level filter for select(): every condition must hold (PostgREST's and=(...) parameter)
+    return {"and": "(" + ",".join(conds) + ")"} if conds else {}
+
+
+class SupabaseError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Supabase error {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class AsyncPostgrest:
+    def __init__(self, url: str, key: str, timeout: float = 10.0, max_connections: int = 20):
+        self.base = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _check(r: httpx.Response):
+        if r.status_code >= 400:
+            raise SupabaseError(r.status_code, r.text)
+
+    async def select(self, table: str, columns: str = "*", filters: dict = None,
+                     order: str = None, limit: int = None, offset: int = None) -> list:
+        params = {"select": columns}
+        params.update(filters or {})
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = str(limit)
+        if offset:
+            params["offset"] = str(offset)
+        r = await self.client.get(f"{self.base}/{table}", params=params)
+        self._check(r)
+        return r.json()
+
+    async def rpc(self, fn: str, params: dict):
+        r = await self.client.post(f"{self.base}/rpc/{fn}", json=params)
+        self._check(r)
+        return r.json()
+
+    async def insert(self, table: str, rows: list) -> None:
+        r = await self.client.post(f"{self.base}/{table}", json=rows, headers={"Prefer": "return=minimal"})
+        self._check(r)
+
+    async def upsert(self, table: str, rows: list, on_conflict: str) -> None:
+        r = await self.client.post(f"{self.base}/{table}", json=rows, params={"on_conflict": on_conflict},
+                                   headers={"Prefer": "resolution=merge-duplicates,return=minimal"})
+        self._check(r)
+
+    async def update(self, table: str, filters: dict, values: dict) -> None:
+        r = await self.client.patch(f"{self.base}/{table}", params=filters, json=values,
+                                    headers={"Prefer": "return=minimal"})
+        self._check(r)
+
+    async def delete(self, table: str, filters: dict) -> None:
+        r = await self.client.delete(f"{self.base}/{table}", params=filters,
+                                     headers={"Prefer": "return=minimal"})
+        self._check(r)
@@ -0,0 +1,7 @@
+# File: tests/conftest.py
+# The modules live at the repo root rather than in a package; make them importable from tests/
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
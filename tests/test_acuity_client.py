@@ -0,0 +1,103 @@
+# File: tests/test_acuity_client.py
+
+import time
+
+import pytest
+
+from acuity_client import AcuityClient, AcuityError, AcuityUnavailable, MissingAcuityCredentials
+from fakes import FakeAcuityServer
+
+CLIENT = "acme-co"
+TIMES = {f"2030-01-{d:02d}": [f"2030-01-{d:02d}T{h:02d}:00:00+00:00" for h in (9, 10, 11)] for d in range(7, 13)}
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    monkeypatch.setenv("ACUITY_USER_ID_ACME_CO", "u")
+    monkeypatch.setenv("ACUITY_API_KEY_ACME_CO", "k")
+    monkeypatch.setenv("ACUITY_SERVICE_ID_ACME_CO", "42")
+
+
+@pytest.fixture
+def acuity():
+    with FakeAcuityServer(TIMES) as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(acuity):
+    c = AcuityClient(acuity.url, retries=3, backoff=0)
+    yield c
+    c.close()
+
+
+def test_availability_times(acuity, client):
+    assert client.availability_times(CLIENT, "2030-01-07") == TIMES["2030-01-07"]
+    (method, path), = acuity.requests
+    assert method == "GET"
+    assert "appointmentTypeID=42" in path and "date=2030-01-07" in path
+
+
+def test_get_is_retried_on_5xx(acuity, client):
+    acuity.fail_next(503, 502)
+    assert client.availability_times(CLIENT, "2030-01-07") == TIMES["2030-01-07"]
+    assert len(acuity.requests) == 3
+
+
+def test_get_gives_up_after_retries(acuity, client):
+    acuity.fail_next(503, 503, 503, 503)
+    with pytest.raises(AcuityError) as e:
+        client.availability_times(CLIENT, "2030-01-07")
+    assert e.value.status_code == 503
+    assert len(acuity.requests) == 4  # first try + 3 retries
+
+
+def test_client_errors_are_not_retried(acuity, client):
+    acuity.fail_next(400)
+    with pytest.raises(AcuityError) as e:
+        client.availability_times(CLIENT, "2030-01-07")
+    assert e.value.status_code == 400
+    assert len(acuity.requests) == 1
+
+
+def test_booking_post_is_never_retried(acuity, client):
+    # Re-sending POST /appointments after a 5xx could double-book
+    acuity.fail_next(503)
+    with pytest.raises(AcuityError):
+        client.create_appointment(CLIENT, "Ada", "Lovelace", "ada@example.com", "2030-01-07T09:00:00+00:00", "hi")
+    assert len(acuity.requests) == 1
+    created = client.create_appointment(CLIENT, "Ada", "Lovelace", "ada@example.com",
+                                        "2030-01-07T09:00:00+00:00", "hi")
+    assert created["confirmationPage"].endswith("/confirm/1")
+    assert acuity.appointments[0]["appointmentTypeID"] == 42
+
+
+def test_network_failure_maps_to_unavailable():
+    c = AcuityClient("http://127.0.0.1:1", retries=0, backoff=0)
+    try:
+        with pytest.raises(AcuityUnavailable):
+            c.availability_times(CLIENT, "2030-01-07")
+    finally:
+        c.close()
+
+
+def test_missing_credentials_fail_before_any_request(acuity, client, monkeypatch):
+    monkeypatch.delenv("ACUITY_API_KEY_ACME_CO")
+    with pytest.raises(MissingAcuityCredentials):
+        client.availability_times_many(CLIENT, list(TIMES))
+    assert acuity.requests == []
+
+
+def test_fan_out_runs_dates_concurrently(acuity, client):
+    acuity.delay = 0.3
+    started = time.perf_counter()
+    by_date = client.availability_times_many(CLIENT, list(TIMES))
+    elapsed = time.perf_counter() - started
+    assert by_date == TIMES
+    assert elapsed < 0.3 * len(TIMES) / 2  # serial would take 0.3 s per date
+
+
+def test_fan_out_surfaces_a_failed_date(acuity, client):
+    acuity.fail_next(400)
+    with pytest.raises(AcuityError):
+        client.availability_times_many(CLIENT, list(TIMES))
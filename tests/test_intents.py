@@ -0,0 +1,41 @@
+# File: tests/test_intents.py
+
+import pytest
+
+from intents import IntentRouter, IntentRouters
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text", ["start over", "Start   over!", "I'll book\tlater", "never mind"])
+def test_cancel_phrases_allow_any_run_of_whitespace(router, text):
+    assert router.route(text).cancel
+
+
+@pytest.mark.parametrize("text", ["startover", "booklater", "nevermind"])
+def test_spaces_in_phrases_are_not_optional(router, text):
+    assert not router.route(text).cancel
+
+
+def test_cancel_only_and_booking(router):
+    assert router.route("Never mind.").cancel_only
+    assert not router.route("never mind, what are your hours?").cancel_only
+    assert router.route("Can I book a meeting?").booking
+
+
+def test_greetings_match_whole_words(router):
+    assert router.route("Hello there!").greeting_only
+    assert router.route("hi, what do you cost?").greeting
+    assert not router.route("this is a high price").greeting
+
+
+def test_client_overrides_are_cached_per_phrase_set():
+    routers = IntentRouters(max_routers=2)
+    cfg = {"intents": {"cancel": ["abort mission"]}}
+    router = routers.for_config(cfg)
+    assert router is routers.for_config(dict(cfg))
+    assert router.route("abort  mission").cancel and not router.route("start over").cancel
+    assert routers.for_config({}) is routers.default
@@ -0,0 +1,128 @@
+# File: tests/test_kb_index.py
+
+import asyncio
+
+import pytest
+
+from fakes import FakeSupabaseServer
+from kb_index import KBIndexRegistry, encode_embedding
+from supabase_rest import AsyncPostgrest, SupabaseError
+
+TABLE = "client_knowledge_base"
+
+
+def kb_row(id, content, vec, **extra):
+    return {"id": id, "client_id": "acme", "content": content, "content_hash": f"h-{content}",
+            "embedding_f32": encode_embedding(vec), **extra}
+
+
+@pytest.fixture
+def supabase():
+    with FakeSupabaseServer({TABLE: [kb_row(1, "refunds", [1, 0]), kb_row(2, "hours", [0, 1])]}) as fake:
+        yield fake
+
+
+def run_with_registry(fake, body, refresh_seconds=0):
+    async def run():
+        rest = AsyncPostgrest(fake.url, "k")
+        try:
+            return await body(KBIndexRegistry(rest, TABLE, refresh_seconds=refresh_seconds), rest)
+        finally:
+            await rest.aclose()
+
+    return asyncio.run(run())
+
+
+def test_search_ranks_by_cosine(supabase):
+    async def body(reg, rest):
+        return await reg.search("acme", [0.9, 0.1], 2)
+
+    hits = run_with_registry(supabase, body)
+    assert [c for c, _ in hits] == ["refunds", "hours"]
+
+
+def test_refresh_refetches_only_changed_rows(supabase):
+    async def body(reg, rest):
+        await reg.get("acme")
+        supabase.tables[TABLE][0].update(content="refunds (30 days)", content_hash="h-new")
+        supabase.tables[TABLE].append(kb_row(3, "parking", [1, 1]))
+        n = len(supabase.requests)
+        hits = await reg.search("acme", [1, 0], 1)
+        return hits, supabase.requests[n:], reg.kb_version("acme")
+
+    hits, requests, version = run_with_registry(supabase, body)
+    assert hits[0][0] == "refunds (30 days)"
+    assert any("id=in.%281%2C3%29" in path or "id=in.%283%2C1%29" in path for _, path in requests)
+    assert version == 2
+
+
+def test_invalidate_reloads_edits_the_hash_cannot_see(supabase):
+    async def body(reg, rest):
+        await reg.get("acme")
+        supabase.tables[TABLE][1]["embedding_f32"] = encode_embedding([1, 0.01])  # re-embedded, same content
+        before = await reg.search("acme", [1, 0], 2)
+        reg.invalidate("acme")
+        return before, await reg.search("acme", [1, 0], 2)
+
+    before, after = run_with_registry(supabase, body)
+    assert before[1][1] == pytest.approx(0.0)
+    assert after[1][1] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_invalidate_after_every_row_is_deleted_empties_the_index(supabase):
+    async def body(reg, rest):
+        await reg.get("acme")
+        supabase.tables[TABLE].clear()
+        reg.invalidate("acme")
+        hits = await reg.search("acme", [1, 0], 2)
+        n = len(supabase.requests)
+        reg.refresh_seconds = 60
+        await reg.search("acme", [1, 0], 2)  # no longer stale: served without another listing
+        return hits, reg._indexes["acme"], len(supabase.requests) - n
+
+    hits, idx, listings = run_with_registry(supabase, body)
+    assert hits == []
+    assert len(idx) == 0 and not idx.stale and idx.version == 2
+    assert listings == 0
+
+
+def test_failed_refresh_keeps_serving_and_backs_off(supabase):
+    async def body(reg, rest):
+        await reg.get("acme")
+        rest.base, up = "http://127.0.0.1:1/rest/v1", rest.base
+        reg.refresh_seconds = 60
+        reg._indexes["acme"].checked_at = 0
+        hits = await reg.search("acme", [1, 0], 1)
+        failures = reg._indexes["acme"].failures
+        n = len(supabase.requests)
+        await reg.search("acme", [1, 0], 1)  # inside the backoff window: no new attempt
+        rest.base = up
+        return hits, failures, len(supabase.requests) - n
+
+    hits, failures, attempts = run_with_registry(supabase, body)
+    assert hits[0][0] == "refunds"
+    assert failures == 1
+    assert attempts == 0
+
+
+def test_binary_fallback_only_on_missing_column():
+    class Rest:
+        def __init__(self, error):
+            self.error = error
+
+        async def select(self, table, columns="*", filters=None, **kw):
+            if "embedding_f32" in columns:
+                raise self.error
+            return [{"id": 1, "content": "x", "embedding": "[1, 0]"}]
+
+    async def fetch(error):
+        reg = KBIndexRegistry(Rest(error), TABLE)
+        try:
+            await reg._fetch_rows("acme", [1])
+        except SupabaseError:
+            return reg.binary, "raised"
+        return reg.binary, "fell back"
+
+    missing = SupabaseError(400, '{"code": "42703", "message": "column embedding_f32 does not exist"}')
+    assert asyncio.run(fetch(missing)) == (False, "fell back")
+    assert asyncio.run(fetch(SupabaseError(503, "upstream timeout"))) == (True, "raised")
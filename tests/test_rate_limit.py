@@ -0,0 +1,80 @@
+# File: tests/test_rate_limit.py
+
+import asyncio
+
+import pytest
+
+from rate_limit import Limit, MemoryRateLimiter, RateLimits, SQLiteRateLimiter, limits_env_name, parse_limits
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    if request.param == "memory":
+        return MemoryRateLimiter()
+    return SQLiteRateLimiter(str(tmp_path / "rl.db"))
+
+
+def test_parse():
+    limits = parse_limits("*=30/60, book=5/10")
+    assert (limits["*"].requests, limits["*"].period) == (30, 60)
+    assert (limits["book"].requests, limits["book"].period) == (5, 10)
+    assert Limit.parse("7").period == 60
+
+
+def test_bucket_allows_burst_then_rejects_with_retry_after(limiter):
+    limit = Limit(3, 60)
+    assert [limiter.hit("k", limit)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = limiter.hit("k", limit)
+    assert not allowed
+    assert 0 < retry_after <= 20  # one token refills every 20 s
+    assert limiter.hit("other", limit)[0]
+
+
+def test_bucket_refills_over_time(limiter, monkeypatch):
+    import rate_limit
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    limit = Limit(2, 10)
+    assert limiter.hit("k", limit)[0] and limiter.hit("k", limit)[0]
+    assert not limiter.hit("k", limit)[0]
+    now[0] += 5  # one token back
+    assert limiter.hit("k", limit)[0]
+    assert not limiter.hit("k", limit)[0]
+
+
+def test_memory_limiter_stays_bounded():
+    limiter = MemoryRateLimiter(max_keys=10)
+    for i in range(50):
+        limiter.hit(f"k{i}", Limit(1, 60))
+    assert limiter.stats()["keys"] == 10
+    assert limiter.evictions == 40
+
+
+def test_route_and_client_overrides(monkeypatch):
+    rl = RateLimits(MemoryRateLimiter(), Limit(10, 60), parse_limits("book=2/60"))
+    monkeypatch.setenv(limits_env_name("acme-co"), "*=1/60")
+    assert rl.limit_for("chat").requests == 10
+    assert rl.limit_for("book").requests == 2
+    assert rl.limit_for("chat", "acme-co").requests == 1
+    assert rl.check("chat", "acme-co", "1.2.3.4") is None
+    assert rl.check("chat", "acme-co", "1.2.3.4") >= 1
+    assert rl.check("chat", "acme-co", "5.6.7.8") is None  # buckets are per caller
+
+
+def test_rotating_client_id_still_hits_per_caller_bucket(limiter):
+    rl = RateLimits(limiter, Limit(3, 60), per_caller=Limit(5, 60))
+    results = [rl.check("chat", f"client-{i}", "1.2.3.4") for i in range(8)]
+    assert results[:5] == [None] * 5
+    assert all(r is not None for r in results[5:])
+    assert rl.rejected == 3
+    assert rl._clients == {}  # nothing kept for ids without an env override
+
+
+def test_acheck_matches_check(limiter):
+    rl = RateLimits(limiter, Limit(1, 60))
+
+    async def run():
+        return [await rl.acheck("chat", "c", "ip") for _ in range(2)]
+
+    first, second = asyncio.run(run())
+    assert first is None and second >= 1
@@ -0,0 +1,64 @@
+# File: tests/test_slots.py
+
+import datetime
+
+import pytz
+
+from slots import BusyIntervals, generate_slots
+
+TZ = pytz.timezone("America/New_York")
+MONDAY = datetime.date(2030, 1, 7)
+CFG = {"availableHours": {"monday": ["09:00", "12:00"]}, "meetingDuration": 60, "slotStep": 30}
+
+
+def local(h, m=0, day=MONDAY):
+    return TZ.localize(datetime.datetime.combine(day, datetime.time(h, m)))
+
+
+def times(slots):
+    return [s.strftime("%H:%M") for s in slots]
+
+
+def test_open_day_is_stepped_from_opening_time():
+    slots = generate_slots(MONDAY, MONDAY, TZ, CFG, BusyIntervals())[MONDAY]
+    assert times(slots) == ["09:00", "09:30", "10:00", "10:30", "11:00"]
+
+
+def test_closed_day_has_no_slots():
+    tuesday = MONDAY + datetime.timedelta(days=1)
+    assert generate_slots(tuesday, tuesday, TZ, CFG, BusyIntervals()) == {tuesday: []}
+
+
+def test_busy_block_removes_overlapping_slots_and_realigns_after_it():
+    busy = BusyIntervals([(local(10), local(10, 15))])
+    slots = generate_slots(MONDAY, MONDAY, TZ, CFG, busy)[MONDAY]
+    assert times(slots) == ["09:00", "10:30", "11:00"]
+
+
+def test_buffers_pad_busy_blocks():
+    busy = BusyIntervals([(local(10), local(10, 30))])
+    # bufferBefore is free time needed before a meeting, so it pushes the first slot after the block back
+    cfg = dict(CFG, bufferBefore=30)
+    assert times(generate_slots(MONDAY, MONDAY, TZ, cfg, busy)[MONDAY]) == ["09:00", "11:00"]
+    cfg = dict(CFG, bufferAfter=30)
+    assert times(generate_slots(MONDAY, MONDAY, TZ, cfg, busy)[MONDAY]) == ["10:30", "11:00"]
+
+
+def test_google_busy_with_other_offsets_compares_as_instants():
+    # 15:00Z is 10:00 in New York in January
+    busy = BusyIntervals.from_google([{"start": "2030-01-07T15:00:00Z", "end": "2030-01-07T16:00:00+00:00"}])
+    assert busy.overlaps(local(10, 30), local(10, 45))
+    assert not busy.overlaps(local(11), local(12))
+    assert times(generate_slots(MONDAY, MONDAY, TZ, CFG, busy)[MONDAY]) == ["09:00", "11:00"]
+
+
+def test_overlapping_busy_blocks_are_merged():
+    busy = BusyIntervals([(local(9), local(10)), (local(9, 30), local(11)), (local(11), local(11, 15))])
+    assert len(busy) == 1
+
+
+def test_not_before_and_limit():
+    slots = generate_slots(MONDAY, MONDAY + datetime.timedelta(days=7), TZ, CFG, BusyIntervals(),
+                           not_before=local(9, 40), limit=3)
+    assert times(slots[MONDAY]) == ["10:00", "10:30", "11:00"]
+    assert all(d == MONDAY or not s for d, s in slots.items())
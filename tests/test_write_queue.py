@@ -0,0 +1,159 @@
+# File: tests/test_write_queue.py
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from fakes import FakeSupabaseServer
+from supabase_rest import AsyncPostgrest
+from write_queue import WriteQueue
+
+DOWN = "http://127.0.0.1:1/rest/v1"  # nothing listens there: every insert fails to connect
+
+
+@pytest.fixture
+def supabase():
+    with FakeSupabaseServer() as fake:
+        yield fake
+
+
+def rows(fake, table="logs"):
+    return sorted(r["n"] for r in fake.tables.get(table, []))
+
+
+def journal_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batches_are_written(supabase):
+    async def run():
+        rest = AsyncPostgrest(supabase.url, "k")
+        q = WriteQueue(rest, batch_size=3, flush_interval=60)
+        await q.start()
+        for n in range(7):
+            q.put("logs", {"n": n})
+        assert await q.flush()
+        await q.aclose()
+        await rest.aclose()
+        return q
+
+    q = asyncio.run(run())
+    assert rows(supabase) == list(range(7))
+    assert (q.written, q.batches) == (7, 3)
+
+
+def test_outage_spills_to_journal_and_replay_writes_it(supabase, tmp_path):
+    journal = str(tmp_path / "writes.jsonl")
+
+    async def run():
+        rest = AsyncPostgrest(supabase.url, "k")
+        q = WriteQueue(rest, batch_size=2, flush_interval=60, journal_path=journal)
+        await q.start()
+        q.put("logs", {"n": 0})
+        await q.flush()
+        rest.base, up = DOWN, rest.base
+        for n in range(1, 6):
+            q.put("logs", {"n": n})
+        assert not await q.flush()
+        assert len(journal_lines(journal)) == 5 and q.spilled == 5
+        rest.base = up
+        await q.replay()
+        await q.aclose()
+        await rest.aclose()
+        return q
+
+    q = asyncio.run(run())
+    assert rows(supabase) == list(range(6))
+    assert q.replayed == 5
+    assert not os.path.exists(journal) and not os.path.exists(journal + ".replay")
+
+
+def test_replay_during_outage_keeps_every_row(supabase, tmp_path):
+    journal = str(tmp_path / "writes.jsonl")
+
+    async def run():
+        rest = AsyncPostgrest(DOWN.rsplit("/rest/v1", 1)[0], "k")
+        q = WriteQueue(rest, batch_size=2, flush_interval=60, journal_path=journal)
+        await q.start()
+        for n in range(5):
+            q.put("logs", {"n": n})
+        await q.flush()
+        await q.replay()  # still down: claimed rows go back to the journal, nothing is lost
+        await q.aclose()
+        await rest.aclose()
+
+    asyncio.run(run())
+    claimed = journal_lines(journal + ".replay")
+    spilled = journal_lines(journal)
+    assert not claimed
+    assert sorted(e["row"]["n"] for e in spilled) == list(range(5))
+
+
+def test_claimed_journal_survives_a_crash_mid_replay(supabase, tmp_path):
+    # A .replay file left behind by a crashed worker is replayed by the next one
+    journal = str(tmp_path / "writes.jsonl")
+    with open(journal + ".replay", "w", encoding="utf-8") as f:
+        for n in range(3):
+            f.write(json.dumps({"table": "logs", "row": {"n": n}}) + "\n")
+        f.write('{"table": "logs", "ro')  # torn final line
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"table": "logs", "row": {"n": 3}}) + "\n")
+
+    async def run():
+        rest = AsyncPostgrest(supabase.url, "k")
+        await WriteQueue(rest, batch_size=10, journal_path=journal).replay()
+        await rest.aclose()
+
+    asyncio.run(run())
+    assert rows(supabase) == [0, 1, 2, 3]
+    assert not os.path.exists(journal + ".replay")
+
+
+def test_without_journal_failed_rows_wait_in_memory(supabase):
+    async def run():
+        rest = AsyncPostgrest(supabase.url, "k")
+        q = WriteQueue(rest, batch_size=2, flush_interval=60, max_pending=4)
+        await q.start()
+        rest.base, up = DOWN, rest.base
+        for n in range(6):
+            q.put("logs", {"n": n})
+        assert not await q.flush()
+        assert len(q) == 4 and q.dropped == 2  # oldest rows go first once max_pending is reached
+        rest.base = up
+        assert await q.flush()
+        await q.aclose()
+        await rest.aclose()
+
+    asyncio.run(run())
+    assert rows(supabase) == [2, 3, 4, 5]
+
+
+def test_rejected_row_does_not_sink_its_batch():
+    class Rest:
+        def __init__(self):
+            self.rows = []
+
+        async def insert(self, table, rows):
+            from supabase_rest import SupabaseError
+            if any(r.get("bad") for r in rows):
+                raise SupabaseError(400, "invalid input")
+            self.rows.extend(rows)
+
+    async def run():
+        rest = Rest()
+        q = WriteQueue(rest, batch_size=3, flush_interval=60)
+        await q.start()
+        for row in ({"n": 0}, {"n": 1, "bad": True}, {"n": 2}):
+            q.put("logs", row)
+        assert await q.flush()
+        await q.aclose()
+        return rest, q
+
+    rest, q = asyncio.run(run())
+    assert [r["n"] for r in rest.rows] == [0, 2]
+    assert q.rejected == 1
@@ -0,0 +1,252 @@
+# File: write_queue.py
+# Background bulk inserts for fire-and-forget rows, with an on-disk journal for when Supabase is unreachable
+
+import asyncio
+import collections
+import fcntl
+import json
+import os
+import traceback
+
+import httpx
+
+from supabase_rest import SupabaseError
+
+
+def _retryable(e: Exception) -> bool:
+    # Network trouble, 5xx, 408 and 429 will pass on a later attempt; other 4xx means the rows are bad
+    if isinstance(e, SupabaseError):
+        return e.status_code >= 500 or e.status_code in (408, 429)
+    return isinstance(e, (httpx.HTTPError, OSError))
+
+
+class WriteQueue:
+    def __init__(self, rest, batch_size: int = 50, flush_interval: float = 2.0, journal_path: str = None,
+                 max_pending: int = 10000, max_backoff: float = 60.0):
+        self.rest = rest  # supabase_rest.AsyncPostgrest
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # None = rows that can't be written stay in memory (up to max_pending) and are retried with backoff;
+        # they survive an outage but not a restart
+        self.journal_path = journal_path
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._pending = collections.defaultdict(list)  # table -> [row]
+        self._held = collections.defaultdict(list)  # table -> [row] that failed to write; retried ahead of _pending
+        self._wake = None
+        self._flushing = None
+        self._task = None
+        self._failed_flushes = 0  # consecutive; drives the retry backoff
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._pending.values()) + sum(len(rows) for rows in self._held.values())
+
+    def put(self, table: str, row: dict):
+        self._pending[table].append(row)
+        if self._wake is not None and len(self._pending[table]) >= self.batch_size:
+            self._wake.set()
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._flushing = asyncio.Lock()
+        await self.replay()
+        self._task = asyncio.create_task(self._run())
+
+    def _delay(self) -> float:
+        if not self._failed_flushes:
+            return self.flush_interval
+        return min(self.flush_interval * 2 ** self._failed_flushes, self.max_backoff)
+
+    async def _run(self):
+        while True:
+            if self._failed_flushes:
+                await asyncio.sleep(self._delay())  # Supabase is down; full batches don't make it come back sooner
+            else:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            try:
+                if await self.flush() and self._journal_has_rows():
+                    await self.replay()
+            except Exception:
+                traceback.print_exc()
+
+    async def flush(self) -> bool:
+        # → False if anything had to be spilled to the journal or held back for a retry
+        async with self._flushing:
+            ok = True
+            for table in list(self._held) + [t for t in self._pending if t not in self._held]:
+                rows, self._pending[table] = self._held.pop(table, []) + self._pending[table], []
+                for i in range(0, len(rows), self.batch_size):
+                    batch = rows[i:i + self.batch_size]
+                    if not ok:
+                        # Already failed once this round: don't wait out another timeout per batch
+                        await self._spill(table, batch)
+                    elif not await self._write(table, batch):
+                        ok = False
+            self._failed_flushes = 0 if ok else self._failed_flushes + 1
+            return ok
+
+    async def _write(self, table: str, rows: list, fresh: bool = True) -> bool:
+        if not rows:
+            return True
+        try:
+            await self.rest.insert(table, rows)
+        except Exception as e:
+            self.failures += 1
+            if _retryable(e):
+                await self._spill(table, rows, fresh)
+                return False
+            if len(rows) > 1:
+                # One bad row shouldn't sink its batch; find it
+                return all([await self._write(table, [row], fresh) for row in rows])
+            self.rejected += 1
+            print(f"⚠️ Dropped {table} row rejected by Supabase: {e}")
+            return True
+        self.written += len(rows)
+        self.batches += 1
+        return True
+
+    async def _spill(self, table: str, rows: list, fresh: bool = True):
+        if not self.journal_path:
+            self._hold(table, rows)
+            return
+        await asyncio.to_thread(self._append_journal, table, rows)  # flock + fsync stay off the event loop
+        if fresh:  # rows put back by a failed replay were already counted
+            self.spilled += len(rows)
+
+    def _hold(self, table: str, rows: list):
+        # No journal: keep the rows for the next flush, ahead of anything queued since, dropping the oldest
+        # held rows past max_pending
+        self._held[table].extend(rows)
+        over = len(self) - self.max_pending
+        for t in list(self._held):
+            if over <= 0:
+                break
+            n = min(over, len(self._held[t]))
+            del self._held[t][:n]
+            over -= n
+            self.dropped += n
+            print(f"⚠️ Lost {n} {t} rows: Supabase unavailable, no journal configured and the queue is full")
+
+    # ── journal ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def _torn(path: str) -> bool:
+        # A crash mid-append leaves a last line without its newline; the next append must not glue onto it
+        try:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False  # missing or empty
+
+    def _locked(self):
+        # Workers may share one journal; an flock on a sidecar file serializes appends and claims
+        lock = open(self.journal_path + ".lock", "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _append_journal(self, table: str, rows: list):
+        with self._locked():
+            torn = self._torn(self.journal_path)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                if torn:
+                    f.write("\n")
+                for row in rows:
+                    f.write(json.dumps({"table": table, "row": row}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _journal_has_rows(self) -> bool:
+        if not self.journal_path:
+            return False
+        return any(os.path.exists(p) and os.path.getsize(p) > 0
+                   for p in (self.journal_path, self.journal_path + ".replay"))
+
+    def _claim_journal(self):
+        # → (claim lock, {table: [row]}), or (None, {}) while another worker is replaying.
+        # The journal is moved into a ".replay" file that stays on disk until every row in it has been written
+        # or spilled again, so a crash mid-replay repeats rows (at-least-once) instead of losing them.
+        claim = open(self.journal_path + ".replay.lock", "a")
+        try:
+            fcntl.flock(claim, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            claim.close()
+            return None, {}
+        claimed = self.journal_path + ".replay"
+        with self._locked():
+            if os.path.exists(self.journal_path):
+                if os.path.exists(claimed):
+                    torn = self._torn(claimed)
+                    with open(self.journal_path, encoding="utf-8") as src, open(claimed, "a", encoding="utf-8") as dst:
+                        dst.write(("\n" if torn else "") + src.read())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, claimed)
+        by_table = collections.defaultdict(list)
+        if os.path.exists(claimed):
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash mid-write
+                    by_table[entry["table"]].append(entry["row"])
+        return claim, by_table
+
+    def _finish_claim(self):
+        claimed = self.journal_path + ".replay"
+        if os.path.exists(claimed):
+            os.remove(claimed)
+
+    async def replay(self):
+        if not self._journal_has_rows():
+            return
+        claim, by_table = await asyncio.to_thread(self._claim_journal)
+        if claim is None:
+            return
+        try:
+            down = False
+            for table, rows in by_table.items():
+                for i in range(0, len(rows), self.batch_size):
+                    batch = rows[i:i + self.batch_size]
+                    if down:
+                        # Still unavailable: put the rest back without waiting on more timeouts
+                        await self._spill(table, batch, fresh=False)
+                    elif await self._write(table, batch, fresh=False):
+                        self.replayed += len(batch)
+                    else:
+                        down = True
+            # Every claimed row is now in Supabase or back in the journal
+            await asyncio.to_thread(self._finish_claim)
+        finally:
+            claim.close()  # releases the flock
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        await self.flush()
+        if len(self):
+            print(f"⚠️ Lost {len(self)} queued rows at shutdown: Supabase unavailable and no journal configured")
+
+    def stats(self) -> dict:
+        return {"pending": len(self), "written": self.written, "batches": self.batches, "spilled": self.spilled,
+                "held": sum(len(rows) for rows in self._held.values()), "dropped": self.dropped,
+                "replayed": self.replayed, "rejected": self.rejected, "failures": self.failures,
+                "journal": self._journal_has_rows()}